@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Benchmarks for code generated by the Nova compiler.
+#
+# Usage: python run_benchmarks.py [benchmark ...]
+#
+# Every case is transpiled with compiler.py, built with g++ -O2 and run twice:
+# once with the baseline input and once with the measured input. Only the
+# difference between the two runs is reported, so setup work such as filling
+# arrays is not counted.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+COMPILER = os.path.join(HERE, "..", "compiler", "compiler.py")
+CXX = os.environ.get("CXX", "g++")
+REPEAT = 3
+
+def as_soa(source):
+    return source.replace("struct Particle", "@soa struct Particle", 1)
+
+# name -> list of cases
+# A case is (label, nova file, source transform, compiler flags,
+#            baseline input, measured input, work units)
+BENCHMARKS = {
+    "struct_layout": [
+        ("array of structs", "struct_field_sum.nova", None, [], "0", "20", 20 * 10_000_000),
+        ("structure of arrays", "struct_field_sum.nova", as_soa, [], "0", "20", 20 * 10_000_000),
+    ],
+    "string_concat": [
+        ("std::string operator+", "string_concat.nova", None, ["--no-string-builder"], "0", "2000000", 2_000_000),
+        ("string builder", "string_concat.nova", None, [], "0", "2000000", 2_000_000),
+    ],
+    "array_ops": [
+        ("while loop", "array_saxpy_while.nova", None, [], "0", "200", 200 * 1_000_000),
+        ("whole-array expression", "array_saxpy.nova", None, [], "0", "200", 200 * 1_000_000),
+    ],
+    "map_lookup": [
+        ("1k entries", "map_lookup.nova", None, [], "1000\n0", "1000\n10000000", 10_000_000),
+        ("1M entries", "map_lookup.nova", None, [], "1000000\n0", "1000000\n10000000", 10_000_000),
+        ("10M entries", "map_lookup.nova", None, [], "10000000\n0", "10000000\n10000000", 10_000_000),
+    ],
+}
+
+def build(nova_file, transform, flags, workdir):
+    with open(os.path.join(HERE, nova_file)) as f:
+        source = f.read()
+    if transform:
+        source = transform(source)
+    name = os.path.splitext(nova_file)[0]
+    nova_path = os.path.join(workdir, name + ".nova")
+    cpp_path = os.path.join(workdir, name + ".cpp")
+    exe_path = os.path.join(workdir, name)
+    with open(nova_path, "w") as f:
+        f.write(source)
+    with open(cpp_path, "w") as f:
+        subprocess.run([sys.executable, COMPILER, nova_path] + flags, stdout=f, check=True)
+    subprocess.run([CXX, "-std=c++17", "-O2", cpp_path, "-o", exe_path], check=True)
+    return exe_path
+
+def best_time(exe_path, stdin_text):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        subprocess.run([exe_path], input=stdin_text + "\n", text=True,
+                       stdout=subprocess.DEVNULL, check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def run_case(case, workdir):
+    label, nova_file, transform, flags, baseline_input, measured_input, units = case
+    exe_path = build(nova_file, transform, flags, workdir)
+    elapsed = best_time(exe_path, measured_input) - best_time(exe_path, baseline_input)
+    elapsed = max(elapsed, 1e-9)
+    print(f"  {label:<28} {elapsed:8.3f} s  {units / elapsed / 1e6:10.1f} M/s")
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}", file=sys.stderr)
+            sys.exit(1)
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in names:
+            print(name)
+            for case in BENCHMARKS[name]:
+                run_case(case, workdir)
+
+if __name__ == "__main__":
+    main()
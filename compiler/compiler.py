@@ -1,6 +1,7 @@
 import re
 import sys
 import os
+import struct
 
 # --- Lexer ---
 TOKENS = [
@@ -21,6 +22,11 @@ TOKENS = [
     ('IF', r'\bif\b'),
     ('ELSE', r'\belse\b'),
     ('WHILE', r'\bwhile\b'),
+    ('PARALLEL', r'\bparallel\b'),
+    ('FOR', r'\bfor\b'),
+    ('IN', r'\bin\b'),
+    ('REDUCE', r'\breduce\b'),
+    ('MAP', r'\bmap\b'),
     ('EQ', r'=='),
     ('NEQ', r'!='),
     ('LTE', r'<='),
@@ -39,9 +45,11 @@ TOKENS = [
     ('RPAREN', r'\)'),
     ('SEMI', r';'),
     ('COLON', r':'),
+    ('RANGE', r'\.\.'),
     ('DOT', r'\.'),
     ('ARROW', r'->'),
     ('COMMA', r','),
+    ('AT', r'@'),
     ('ASSIGN', r'='),
     ('PLUS', r'\+'),
     ('MINUS', r'-'),
@@ -87,9 +95,14 @@ class ClassNode(Node):
         self.body = body
 
 class StructNode(Node):
-    def __init__(self, name, fields):
+    def __init__(self, name, fields, attributes=None):
         self.name = name
         self.fields = fields # List of (type, name)
+        self.attributes = attributes or [] # e.g. ["soa"]
+
+    @property
+    def soa(self):
+        return 'soa' in self.attributes
 
 class FunctionNode(Node):
     def __init__(self, name, args, ret_type, body):
@@ -123,6 +136,23 @@ class WhileNode(Node):
         self.condition = condition
         self.body = body
 
+class ParallelForNode(Node):
+    def __init__(self, var_name, start, end, iterable, reductions, body):
+        self.var_name = var_name
+        self.start = start # Range bounds (end exclusive), or None when iterating an array
+        self.end = end
+        self.iterable = iterable
+        self.reductions = reductions # List of (op, variable name), op in REDUCTION_OPS
+        self.body = body
+
+class ForNode(Node):
+    def __init__(self, var_names, start, end, iterable, body):
+        self.var_names = var_names # [name] or [key, value] when iterating a map
+        self.start = start # Range bounds (end exclusive), or None when iterating a collection
+        self.end = end
+        self.iterable = iterable
+        self.body = body
+
 class AssignmentNode(Node):
     def __init__(self, name, index_expr, expr):
         self.name = name # For structs, this might be "p.x"
@@ -148,6 +178,16 @@ class MatchDefaultCaseNode(Node):
     def __init__(self, body):
         self.body = body
 
+# Key types supported by map<K, V>.
+MAP_KEY_TYPES = {'int', 'float', 'string'}
+
+# Reductions allowed in `parallel for (...) reduce(op: var)`.
+REDUCTION_OPS = {'sum', 'min', 'max'}
+
+# Attributes that may precede a struct definition, e.g. `@soa struct P { ... }`.
+# soa: arrays of the struct are stored as one vector per field.
+STRUCT_ATTRIBUTES = {'soa'}
+
 class Parser:
     def __init__(self, tokens):
         self.tokens = tokens
@@ -198,6 +238,8 @@ class Parser:
             return self.parse_function()
         elif token[0] == 'STRUCT':
             return self.parse_struct_def()
+        elif token[0] == 'AT':
+            return self.parse_attributed_struct_def()
         elif token[0] == 'CLASS':
             return self.parse_class()
         elif token[0] == 'LET':
@@ -210,6 +252,10 @@ class Parser:
             return self.parse_if()
         elif token[0] == 'WHILE':
             return self.parse_while()
+        elif token[0] == 'PARALLEL':
+            return self.parse_parallel_for()
+        elif token[0] == 'FOR':
+            return self.parse_for()
         elif token[0] == 'MATCH':
             return self.parse_match()
         elif token[0] == 'ID':
@@ -248,7 +294,18 @@ class Parser:
             scan_pos += 1
         return False
 
-    def parse_struct_def(self):
+    def parse_attributed_struct_def(self):
+        # @soa struct Name { ... }
+        attributes = []
+        while self.peek() and self.peek()[0] == 'AT':
+            self.consume('AT')
+            attr = self.consume('ID')[1]
+            if attr not in STRUCT_ATTRIBUTES:
+                raise Exception(f"Unknown struct attribute '@{attr}'")
+            attributes.append(attr)
+        return self.parse_struct_def(attributes)
+
+    def parse_struct_def(self, attributes=None):
         self.consume('STRUCT')
         name = self.consume('ID')[1]
         self.consume('LBRACE')
@@ -261,14 +318,19 @@ class Parser:
             fields.append((field_type, field_name))
         
         self.consume('RBRACE')
+        if attributes and 'soa' in attributes and not fields:
+            raise Exception(f"@soa struct '{name}' needs at least one field")
         self.defined_types.add(name)
-        return StructNode(name, fields)
+        return StructNode(name, fields, attributes)
     
     def parse_single_type(self):
         t = self.consume()
-        if t[0] not in ['INT_TYPE', 'FLOAT_TYPE', 'STRING_TYPE', 'ID']:
+        if t[0] == 'MAP':
+            base_type = self.parse_map_type()
+        elif t[0] not in ['INT_TYPE', 'FLOAT_TYPE', 'STRING_TYPE', 'ID']:
              raise Exception(f"Expected type but got {t}")
-        base_type = t[1]
+        else:
+            base_type = t[1]
 
         if self.peek() and self.peek()[0] == 'LBRACKET':
             self.consume('LBRACKET')
@@ -276,6 +338,17 @@ class Parser:
             return base_type + "[]"
         return base_type
 
+    def parse_map_type(self):
+        # map<K, V> after the `map` keyword; keys must be int, float or string
+        self.consume('LT')
+        key_type = self.parse_single_type()
+        if key_type not in MAP_KEY_TYPES:
+            raise Exception(f"Map keys must be int, float or string, not '{key_type}'")
+        self.consume('COMMA')
+        value_type = self.parse_type()
+        self.consume('GT')
+        return f"map<{key_type},{value_type}>"
+
     def parse_type(self):
         # A type can be a single type or a union of types (e.g., "int or string")
         types = [self.parse_single_type()]
@@ -374,6 +447,60 @@ class Parser:
         body = self.parse_block()
         return WhileNode(condition, body)
 
+    def parse_parallel_for(self):
+        # parallel for (i in 0..n) reduce(sum: total) { ... }
+        # parallel for (x in xs) { ... }
+        self.consume('PARALLEL')
+        var_names, start, end, iterable = self.parse_for_header()
+        if len(var_names) != 1:
+            raise Exception("parallel for takes a single loop variable")
+        var_name = var_names[0]
+
+        reductions = []
+        if self.peek() and self.peek()[0] == 'REDUCE':
+            self.consume('REDUCE')
+            self.consume('LPAREN')
+            while True:
+                op = self.consume('ID')[1]
+                if op not in REDUCTION_OPS:
+                    raise Exception(f"Unknown reduction '{op}', expected one of: {', '.join(sorted(REDUCTION_OPS))}")
+                self.consume('COLON')
+                reductions.append((op, self.consume('ID')[1]))
+                if self.peek()[0] == 'COMMA':
+                    self.consume('COMMA')
+                else:
+                    break
+            self.consume('RPAREN')
+
+        body = self.parse_block()
+        return ParallelForNode(var_name, start, end, iterable, reductions, body)
+
+    def parse_for_header(self):
+        # for (i in 0..n), for (x in xs), for (key, value in m)
+        self.consume('FOR')
+        self.consume('LPAREN')
+        var_names = [self.consume('ID')[1]]
+        if self.peek() and self.peek()[0] == 'COMMA':
+            self.consume('COMMA')
+            var_names.append(self.consume('ID')[1])
+        self.consume('IN')
+        start, end, iterable = None, None, None
+        first = self.parse_expression()
+        if self.peek() and self.peek()[0] == 'RANGE':
+            self.consume('RANGE')
+            start, end = first, self.parse_expression()
+        else:
+            iterable = first
+        self.consume('RPAREN')
+        if len(var_names) > 1 and iterable is None:
+            raise Exception("A range loop takes a single loop variable")
+        return var_names, start, end, iterable
+
+    def parse_for(self):
+        var_names, start, end, iterable = self.parse_for_header()
+        body = self.parse_block()
+        return ForNode(var_names, start, end, iterable, body)
+
     def parse_block(self):
         self.consume('LBRACE')
         body = []
@@ -443,6 +570,22 @@ class Parser:
         self.consume('SEMI')
         return AssignmentNode(lhs_string, None, expr) 
 
+    def parse_map_literal(self):
+        # {k1: v1, k2: v2} -> { {k1, v1}, {k2, v2} }
+        self.consume('LBRACE')
+        entries = []
+        while self.peek() and self.peek()[0] != 'RBRACE':
+            key = self.parse_expression()
+            self.consume('COLON')
+            value = self.parse_expression()
+            entries.append(f"{{{key}, {value}}}")
+            if self.peek() and self.peek()[0] == 'COMMA':
+                self.consume('COMMA')
+            else:
+                break
+        self.consume('RBRACE')
+        return "{ " + ", ".join(entries) + " }"
+
     def parse_expression(self):
         expr_out = []
         balance = 0
@@ -454,10 +597,20 @@ class Parser:
             t = self.peek()
             if not t: break
             if t[0] == 'SEMI': break
-            if t[0] == 'LBRACE': break 
+            if t[0] == 'LBRACE':
+                prev = self.tokens[self.pos - 1][0] if self.pos > 0 else None
+                if not expr_out or prev in ('LPAREN', 'COMMA', 'LBRACKET'):
+                    # {key: value, ...} map literal
+                    expr_out.append(self.parse_map_literal())
+                    last_was_id = False
+                    continue
+                break
+            if t[0] == 'RBRACE': break
             if t[0] == 'RPAREN' and balance == 0: break
             if t[0] == 'RBRACKET' and bracket_balance == 0: break
             if t[0] == 'COMMA' and balance == 0 and bracket_balance == 0: break # argument list separator!
+            if t[0] == 'RANGE' and balance == 0 and bracket_balance == 0: break # range bounds
+            if t[0] == 'COLON' and balance == 0 and bracket_balance == 0: break # map literal key
 
             if t[0] == 'NEW':
                 # new StructName(args)
@@ -526,32 +679,762 @@ class Parser:
                 
         return " ".join(expr_out)
 
+# --- Function analysis ---
+
+# Functions with at most this many statements (counting nested ones) and no
+# recursion are emitted `inline`.
+INLINE_MAX_STATEMENTS = 6
+CONSTEXPR_TYPES = {'int', 'float'}
+# Built-in functions without side effects.
+PURE_BUILTINS = {'sum', 'dot'}
+
+class FunctionInfo:
+    def __init__(self, node):
+        self.node = node
+        self.pure = True
+        self.reason = None # Why the function is not pure
+        self.constexpr = False
+        self.inline = False
+        self.calls = set() # Names of program functions called
+
+def child_blocks(stmt):
+    if isinstance(stmt, IfNode):
+        return [stmt.if_body, stmt.else_body or []]
+    if isinstance(stmt, WhileNode):
+        return [stmt.body]
+    if isinstance(stmt, MatchNode):
+        return [case.body for case in stmt.cases]
+    if isinstance(stmt, (ParallelForNode, ForNode)):
+        return [stmt.body]
+    return []
+
+def iter_statements(stmts):
+    for stmt in stmts:
+        yield stmt
+        for block in child_blocks(stmt):
+            yield from iter_statements(block)
+
+def statement_exprs(stmt):
+    if isinstance(stmt, VarDeclNode):
+        return [stmt.value_expr] if stmt.value_expr else []
+    if isinstance(stmt, (ReturnNode, PrintNode)):
+        return [stmt.expr]
+    if isinstance(stmt, AssignmentNode):
+        return [stmt.name, stmt.expr]
+    if isinstance(stmt, ExpressionNode):
+        return [stmt.text]
+    if isinstance(stmt, (IfNode, WhileNode)):
+        return [stmt.condition]
+    if isinstance(stmt, MatchNode):
+        return [stmt.expr]
+    if isinstance(stmt, (ParallelForNode, ForNode)):
+        return [e for e in (stmt.start, stmt.end, stmt.iterable) if e]
+    return []
+
+def local_names(func):
+    names = {name for _, name in func.args}
+    for stmt in iter_statements(func.body):
+        if isinstance(stmt, VarDeclNode):
+            names.add(stmt.name)
+        elif isinstance(stmt, MatchNode):
+            names.update(case.var_name for case in stmt.cases if isinstance(case, MatchCaseNode))
+        elif isinstance(stmt, ParallelForNode):
+            names.add(stmt.var_name)
+        elif isinstance(stmt, ForNode):
+            names.update(stmt.var_names)
+    return names
+
+def chain_root(tokens, i):
+    # Name at the start of the postfix chain (a[i].b.c) ending before tokens[i].
+    while i > 0:
+        i -= 1
+        kind = tokens[i][0]
+        if kind in ('RBRACKET', 'RPAREN'):
+            depth = 0
+            while i >= 0:
+                if tokens[i][0] in ('RBRACKET', 'RPAREN'):
+                    depth += 1
+                elif tokens[i][0] in ('LBRACKET', 'LPAREN'):
+                    depth -= 1
+                    if depth == 0:
+                        break
+                i -= 1
+        elif kind == 'ID' and (i == 0 or tokens[i - 1][0] != 'DOT'):
+            return tokens[i][1]
+        elif kind not in ('ID', 'DOT'):
+            return None
+    return None
+
+def check_function(info, functions):
+    # Sets info.calls and returns why the function is impure, or None.
+    locals_ = local_names(info.node)
+    for stmt in iter_statements(info.node.body):
+        if isinstance(stmt, PrintNode):
+            return "calls print"
+        if isinstance(stmt, AssignmentNode):
+            root = re.match(r'[a-zA-Z_][a-zA-Z0-9_]*', stmt.name).group(0)
+            if root not in locals_:
+                return f"assigns to non-local '{root}'"
+        for expr in statement_exprs(stmt):
+            tokens = lex(expr)
+            for i, (kind, text) in enumerate(tokens):
+                if kind == 'INPUT':
+                    return "calls input"
+                if kind != 'ID' or i + 1 >= len(tokens) or tokens[i + 1][0] != 'LPAREN':
+                    continue
+                if i > 0 and tokens[i - 1][0] == 'NEW':
+                    continue # struct construction
+                if i > 0 and tokens[i - 1][0] == 'DOT':
+                    root = chain_root(tokens, i - 1)
+                    if root not in locals_:
+                        return f"calls method '{text}' on non-local '{root}'"
+                elif text in functions:
+                    info.calls.add(text)
+                elif text not in PURE_BUILTINS:
+                    return f"calls unknown function '{text}'"
+    return None
+
+def is_constexpr_candidate(func):
+    # C++17 constexpr: scalar signature, initialised locals, no strings or containers
+    if func.ret_type not in CONSTEXPR_TYPES:
+        return False
+    if any(t not in CONSTEXPR_TYPES for t, _ in func.args):
+        return False
+    for stmt in iter_statements(func.body):
+        if isinstance(stmt, (MatchNode, ParallelForNode, ForNode)):
+            return False
+        if isinstance(stmt, VarDeclNode) and (stmt.type_name not in CONSTEXPR_TYPES or not stmt.value_expr):
+            return False
+        for expr in statement_exprs(stmt):
+            if any(kind in ('STRING', 'STRING_TYPE', 'DOT', 'LBRACKET', 'NEW') for kind, _ in lex(expr)):
+                return False
+    return True
+
+def is_recursive(name, infos):
+    stack = list(infos[name].calls)
+    seen = set()
+    while stack:
+        callee = stack.pop()
+        if callee == name:
+            return True
+        if callee in seen or callee not in infos:
+            continue
+        seen.add(callee)
+        stack.extend(infos[callee].calls)
+    return False
+
+def analyze_functions(functions):
+    # Classifies functions as pure (no print/input, no mutation of non-local
+    # state, only pure callees), constexpr and inline candidates.
+    infos = {f.name: FunctionInfo(f) for f in functions}
+    for info in infos.values():
+        info.reason = check_function(info, infos)
+        info.pure = info.reason is None
+
+    # A function is only as pure as its callees; iterate to a fixed point
+    changed = True
+    while changed:
+        changed = False
+        for info in infos.values():
+            if not info.pure:
+                continue
+            impure = sorted(c for c in info.calls if not infos[c].pure)
+            if impure:
+                info.pure = False
+                info.reason = f"calls impure function '{impure[0]}'"
+                changed = True
+
+    for info in infos.values():
+        info.constexpr = info.pure and is_constexpr_candidate(info.node)
+    changed = True
+    while changed:
+        changed = False
+        for info in infos.values():
+            if info.constexpr and any(not infos[c].constexpr for c in info.calls):
+                info.constexpr = False
+                changed = True
+
+    for name, info in infos.items():
+        size = sum(1 for _ in iter_statements(info.node.body))
+        info.inline = size <= INLINE_MAX_STATEMENTS and not is_recursive(name, infos)
+    return infos
+
+def purity_report(infos):
+    lines = ["Function analysis:"]
+    for name, info in infos.items():
+        if info.pure:
+            tags = ["pure"] + (["constexpr"] if info.constexpr else []) + (["inline"] if info.inline else [])
+            lines.append(f"  {name}: {', '.join(tags)}")
+        else:
+            tags = ["not pure"] + (["inline"] if info.inline else [])
+            lines.append(f"  {name}: {', '.join(tags)} ({info.reason})")
+    return "\n".join(lines)
+
 # --- Generator ---
 
+# Code generation switches, set from the command line.
+options = {
+    'string_builder': True, # --no-string-builder
+    'report_pure': False, # --report-pure
+}
+
+# Struct definitions of the program being generated, keyed by name.
+struct_defs = {}
+# Return types of the program's functions, keyed by name.
+function_types = {}
+# Purity analysis of the program's functions, keyed by name.
+function_info = {}
+# Nova types of the variables in scope during generation, innermost scope last.
+scopes = [{}]
+
+# Runtime helpers that can appear in translated expressions, with their Nova types.
+BUILTIN_TYPES = {
+    '_str_cat': 'string',
+    '_input_str': 'string',
+    '_input_int': 'int',
+}
+
+def declare(name, type_name):
+    scopes[-1][name] = type_name
+
+def lookup(name):
+    for scope in reversed(scopes):
+        if name in scope:
+            return scope[name]
+    return None
+
+def generate_block(stmts, declared=()):
+    # Generates a statement list in its own scope; `declared` are (type, name)
+    # pairs visible inside it, e.g. function arguments.
+    scopes.append({name: type_name for type_name, name in declared})
+    code = ""
+    for stmt in stmts:
+        code += "        " + generate_cpp(stmt) + "\n"
+    scopes.pop()
+    return code
+
+# Approximate (size, alignment) in bytes of mapped types on a 64-bit target.
+PRIMITIVE_LAYOUT = {
+    'int': (4, 4),
+    'float': (4, 4),
+    'string': (32, 8),
+}
+VECTOR_LAYOUT = (24, 8)
+MAP_LAYOUT = (64, 8)
+
+def align_up(offset, alignment):
+    return (offset + alignment - 1) // alignment * alignment
+
+def type_layout(t):
+    if len(split_type(t, '|')) > 1:
+        # std::variant: largest alternative plus the index, rounded to alignment
+        layouts = [type_layout(sub_type) for sub_type in split_type(t, '|')]
+        alignment = max(a for _, a in layouts)
+        size = max(sz for sz, _ in layouts) + 1
+        return align_up(size, alignment), alignment
+    if t.endswith("[]"):
+        base = t[:-2]
+        if base in struct_defs and struct_defs[base].soa:
+            return VECTOR_LAYOUT[0] * len(struct_defs[base].fields), VECTOR_LAYOUT[1]
+        return VECTOR_LAYOUT
+    if map_key_value(t):
+        return MAP_LAYOUT
+    if t in PRIMITIVE_LAYOUT:
+        return PRIMITIVE_LAYOUT[t]
+    if t in struct_defs:
+        return struct_layout(struct_defs[t])
+    return 8, 8 # Unknown type, assume pointer-like
+
+def struct_layout(s):
+    offset = 0
+    alignment = 1
+    for f_type, _ in layout_fields(s):
+        f_size, f_align = type_layout(f_type)
+        offset = align_up(offset, f_align) + f_size
+        alignment = max(alignment, f_align)
+    return align_up(offset, alignment), alignment
+
+def layout_fields(s):
+    # Members sorted by decreasing alignment never need inner padding.
+    # The sort is stable, so equally aligned fields keep declaration order.
+    return sorted(s.fields, key=lambda field: -type_layout(field[0])[1])
+
+def generate_struct(s):
+    # Fields are emitted in padding-minimising order; the constructor keeps the
+    # declared order so `new Name(...)` arguments still line up.
+    out = [f"    struct {s.name} {{"]
+    for f_type, f_name in layout_fields(s):
+        out.append(f"        {map_type(f_type)} {f_name};")
+    if s.fields:
+        params = ", ".join(f"{map_type(f_type)} {f_name}" for f_type, f_name in s.fields)
+        inits = ", ".join(f"{f_name}(std::move({f_name}))" for _, f_name in layout_fields(s))
+        out.append(f"        {s.name}() = default;")
+        out.append(f"        {s.name}({params}) : {inits} {{}}")
+    out.append("    };")
+    if s.soa:
+        out.extend(generate_soa(s))
+    return "\n".join(out)
+
+def generate_soa(s):
+    # Structure-of-arrays storage for `Name[]`: one vector per field. Indexing
+    # yields a proxy of references so `arr[i].field` reads and writes in place.
+    names = [f_name for _, f_name in s.fields]
+    ref, soa = f"{s.name}_ref", f"{s.name}_soa"
+    each = lambda fmt: " ".join(fmt.format(n) for n in names)
+    fields_of = lambda fmt: ", ".join(fmt.format(n) for n in names)
+    out = [f"    struct {ref} {{"]
+    for f_type, f_name in s.fields:
+        out.append(f"        {map_type(f_type)}& {f_name};")
+    out.append(f"        operator {s.name}() const {{ return {s.name}({fields_of('{0}')}); }}")
+    out.append(f"        {ref}& operator=(const {s.name}& v) {{ {each('{0} = v.{0};')} return *this; }}")
+    out.append("    };")
+    out.append(f"    struct {soa} {{")
+    for f_type, f_name in s.fields:
+        out.append(f"        std::vector<{map_type(f_type)}> {f_name};")
+    out.append(f"        {soa}() = default;")
+    out.append(f"        {soa}(std::initializer_list<{s.name}> items) {{ reserve(items.size()); for (const {s.name}& v : items) push_back(v); }}")
+    out.append(f"        size_t size() const {{ return {names[0]}.size(); }}")
+    out.append(f"        bool empty() const {{ return {names[0]}.empty(); }}")
+    out.append(f"        void reserve(size_t n) {{ {each('{0}.reserve(n);')} }}")
+    out.append(f"        void resize(size_t n) {{ {each('{0}.resize(n);')} }}")
+    out.append(f"        void clear() {{ {each('{0}.clear();')} }}")
+    out.append(f"        void push_back(const {s.name}& v) {{ {each('{0}.push_back(v.{0});')} }}")
+    out.append(f"        void pop_back() {{ {each('{0}.pop_back();')} }}")
+    out.append(f"        {ref} operator[](size_t i) {{ return {ref}{{{fields_of('{0}[i]')}}}; }}")
+    out.append(f"        {s.name} operator[](size_t i) const {{ return {s.name}({fields_of('{0}[i]')}); }}")
+    out.append("    };")
+    return out
+
+def split_type(t, separator):
+    # Splits a type string at separators outside map<...>
+    parts = []
+    depth = 0
+    start = 0
+    for i, c in enumerate(t):
+        if c == '<':
+            depth += 1
+        elif c == '>':
+            depth -= 1
+        elif c == separator and depth == 0:
+            parts.append(t[start:i])
+            start = i + 1
+    parts.append(t[start:])
+    return parts
+
+def map_key_value(t):
+    # "map<K,V>" -> (K, V), otherwise None
+    if not t or not t.startswith("map<") or not t.endswith(">"):
+        return None
+    key_type, value_type = split_type(t[4:-1], ',')
+    return key_type, value_type
+
 def map_type(t):
     # Handle union types (our internal representation uses '|')
-    if "|" in t:
-        types = t.split('|')
+    if len(split_type(t, '|')) > 1:
+        types = split_type(t, '|')
         mapped_types = [map_type(sub_type) for sub_type in types]
         return f"std::variant<{', '.join(mapped_types)}>"
 
     if t == "string": return "std::string"
     if t.endswith("[]"):
-        base = t.replace("[]", "")
+        base = t[:-2]
+        if base in struct_defs and struct_defs[base].soa:
+            return f"{base}_soa"
         return f"std::vector<{map_type(base)}>"
+    if map_key_value(t):
+        key_type, value_type = map_key_value(t)
+        return f"_NovaMap<{map_type(key_type)}, {map_type(value_type)}>"
     return t # Assumed ID is a valid C++ struct name
 
+# Runtime for `parallel for`, only emitted when a program uses it.
+PARALLEL_RUNTIME = r"""// Work-stealing thread pool for `parallel for`. Every worker owns a deque of
+// index chunks; it pops its own chunks from the front and steals from the back
+// of other workers' deques once it runs dry. NOVA_NUM_THREADS sets the size.
+class _NovaPool {
+public:
+    // Never destroyed: runtime errors call std::exit, possibly on a worker,
+    // and a destructor joining the workers would then join that thread itself.
+    static _NovaPool& get() { static _NovaPool* pool = new _NovaPool; return *pool; }
+    int size() const { return count; }
+
+    template<class F> void run(long long begin, long long end, F&& body) {
+        if (end <= begin) return;
+        if (count == 1 || in_worker()) { body(begin, end, 0); return; } // nested loops run serially
+        long long total = end - begin;
+        long long grain = std::max(1LL, total / (count * 8LL));
+        for (int w = 0; w < count; ++w) {
+            long long lo = begin + total * w / count, hi = begin + total * (w + 1) / count;
+            for (; lo < hi; lo += grain) queues[w].chunks.push_back({lo, std::min(hi, lo + grain)});
+        }
+        job = std::forward<F>(body);
+        {
+            std::lock_guard<std::mutex> lock(mutex);
+            ++generation;
+            active = count - 1;
+        }
+        wake.notify_all();
+        in_worker() = true;
+        drain(0);
+        in_worker() = false;
+        std::unique_lock<std::mutex> lock(mutex);
+        done.wait(lock, [&] { return active == 0; });
+    }
+
+private:
+    struct Chunk { long long lo, hi; };
+    struct alignas(64) Queue { std::mutex lock; std::deque<Chunk> chunks; };
+
+    int count;
+    std::unique_ptr<Queue[]> queues;
+    std::vector<std::thread> threads;
+    std::function<void(long long, long long, int)> job;
+    std::mutex mutex;
+    std::condition_variable wake, done;
+    long long generation = 0;
+    int active = 0;
+
+    _NovaPool() {
+        const char* env = std::getenv("NOVA_NUM_THREADS");
+        count = env ? std::atoi(env) : (int)std::thread::hardware_concurrency();
+        if (count < 1) count = 1;
+        queues.reset(new Queue[count]);
+        for (int w = 1; w < count; ++w) threads.emplace_back([this, w] { worker(w); });
+    }
+
+    static bool& in_worker() { static thread_local bool flag = false; return flag; }
+
+    void worker(int id) {
+        in_worker() = true;
+        long long seen = 0;
+        std::unique_lock<std::mutex> lock(mutex);
+        while (true) {
+            wake.wait(lock, [&] { return generation != seen; });
+            seen = generation;
+            lock.unlock();
+            drain(id);
+            lock.lock();
+            if (--active == 0) done.notify_one();
+        }
+    }
+
+    void drain(int id) {
+        Chunk c;
+        while (pop(id, c) || steal(id, c)) job(c.lo, c.hi, id);
+    }
+
+    bool pop(int id, Chunk& c) {
+        std::lock_guard<std::mutex> lock(queues[id].lock);
+        if (queues[id].chunks.empty()) return false;
+        c = queues[id].chunks.front();
+        queues[id].chunks.pop_front();
+        return true;
+    }
+
+    bool steal(int id, Chunk& c) {
+        for (int k = 1; k < count; ++k) {
+            Queue& victim = queues[(id + k) % count];
+            std::lock_guard<std::mutex> lock(victim.lock);
+            if (victim.chunks.empty()) continue;
+            c = victim.chunks.back();
+            victim.chunks.pop_back();
+            return true;
+        }
+        return false;
+    }
+};
+// Per-worker reduction accumulator, padded to its own cache line
+template<class T> struct alignas(64) _NovaSlot { T value; };"""
+
+# Runtime for map<K, V>, only emitted when a program uses maps.
+MAP_RUNTIME = r"""// Open-addressing hash table for map<K, V>. Entries live in one flat array
+// next to a byte per slot (0 = empty, otherwise 0x80 | 7 hash bits) that is
+// checked before any key comparison. Collisions probe linearly; removal shifts
+// following entries back, so no tombstones accumulate.
+inline uint64_t _nova_mix(uint64_t h) {
+    h ^= h >> 33; h *= 0xff51afd7ed558ccdULL;
+    h ^= h >> 33; h *= 0xc4ceb9fe1a85ec53ULL;
+    return h ^ (h >> 33);
+}
+inline uint64_t _nova_hash(int key) { return _nova_mix((uint32_t)key); }
+inline uint64_t _nova_hash(float key) {
+    if (key == 0.0f) key = 0.0f; // -0.0 == 0.0
+    uint32_t bits;
+    std::memcpy(&bits, &key, sizeof(bits));
+    return _nova_mix(bits);
+}
+inline uint64_t _nova_hash(const std::string& key) { return _nova_mix(std::hash<std::string>{}(key)); }
+
+template<class K, class V> class _NovaMap {
+public:
+    struct Entry { K key; V value; };
+
+    template<class E> class Iter {
+    public:
+        Iter(const uint8_t* meta, E* slots, size_t i, size_t n) : meta(meta), slots(slots), i(i), n(n) { skip(); }
+        E& operator*() const { return slots[i]; }
+        Iter& operator++() { ++i; skip(); return *this; }
+        bool operator!=(const Iter& other) const { return i != other.i; }
+    private:
+        const uint8_t* meta; E* slots; size_t i, n;
+        void skip() { while (i < n && !meta[i]) ++i; }
+    };
+
+    _NovaMap() = default;
+    _NovaMap(std::initializer_list<std::pair<K, V>> items) {
+        for (const auto& item : items) (*this)[item.first] = item.second;
+    }
+
+    size_t size() const { return count; }
+    bool empty() const { return count == 0; }
+    bool contains(const K& key) const { return find(key) != NONE; }
+
+    V& operator[](const K& key) {
+        if ((count + 1) * 4 > meta.size() * 3) grow();
+        uint64_t h = _nova_hash(key);
+        uint8_t tag = 0x80 | (uint8_t)(h >> 57);
+        size_t i = h & mask;
+        while (meta[i]) {
+            if (meta[i] == tag && slots[i].key == key) return slots[i].value;
+            i = (i + 1) & mask;
+        }
+        meta[i] = tag;
+        slots[i].key = key;
+        ++count;
+        return slots[i].value;
+    }
+
+    V& at(const K& key) {
+        size_t i = find(key);
+        if (i == NONE) missing(key);
+        return slots[i].value;
+    }
+    const V& at(const K& key) const {
+        size_t i = find(key);
+        if (i == NONE) missing(key);
+        return slots[i].value;
+    }
+
+    bool remove(const K& key) {
+        size_t hole = find(key);
+        if (hole == NONE) return false;
+        for (size_t j = (hole + 1) & mask; meta[j]; j = (j + 1) & mask) {
+            size_t home = _nova_hash(slots[j].key) & mask;
+            // Entry j may move into the hole unless its home lies in (hole, j]
+            bool stays = hole <= j ? (hole < home && home <= j) : (hole < home || home <= j);
+            if (!stays) {
+                slots[hole] = std::move(slots[j]);
+                meta[hole] = meta[j];
+                hole = j;
+            }
+        }
+        meta[hole] = 0;
+        slots[hole] = Entry{};
+        --count;
+        return true;
+    }
+
+    void clear() {
+        meta.assign(meta.size(), 0);
+        slots.assign(slots.size(), Entry{});
+        count = 0;
+    }
+
+    Iter<Entry> begin() { return Iter<Entry>(meta.data(), slots.data(), 0, meta.size()); }
+    Iter<Entry> end() { return Iter<Entry>(meta.data(), slots.data(), meta.size(), meta.size()); }
+    Iter<const Entry> begin() const { return Iter<const Entry>(meta.data(), slots.data(), 0, meta.size()); }
+    Iter<const Entry> end() const { return Iter<const Entry>(meta.data(), slots.data(), meta.size(), meta.size()); }
+
+private:
+    static constexpr size_t NONE = (size_t)-1;
+    std::vector<uint8_t> meta;
+    std::vector<Entry> slots;
+    size_t count = 0;
+    size_t mask = 0;
+
+    size_t find(const K& key) const {
+        if (count == 0) return NONE;
+        uint64_t h = _nova_hash(key);
+        uint8_t tag = 0x80 | (uint8_t)(h >> 57);
+        for (size_t i = h & mask; meta[i]; i = (i + 1) & mask) {
+            if (meta[i] == tag && slots[i].key == key) return i;
+        }
+        return NONE;
+    }
+
+    void grow() {
+        size_t capacity = meta.empty() ? 16 : meta.size() * 2;
+        std::vector<uint8_t> old_meta(capacity, 0);
+        std::vector<Entry> old_slots(capacity);
+        old_meta.swap(meta);
+        old_slots.swap(slots);
+        mask = capacity - 1;
+        for (size_t j = 0; j < old_meta.size(); ++j) {
+            if (!old_meta[j]) continue;
+            size_t i = _nova_hash(old_slots[j].key) & mask;
+            while (meta[i]) i = (i + 1) & mask;
+            meta[i] = old_meta[j];
+            slots[i] = std::move(old_slots[j]);
+        }
+    }
+
+    [[noreturn]] static void missing(const K& key) {
+        std::cerr << "Key not found in map: " << key << std::endl;
+        std::exit(1);
+    }
+};"""
+
+MAP_INCLUDES = ["<cstdint>", "<cstring>", "<functional>"]
+
+PARALLEL_INCLUDES = ["<thread>", "<mutex>", "<condition_variable>", "<deque>",
+                     "<functional>", "<memory>", "<limits>"]
+
+# Container methods that modify the container they are called on.
+MUTATING_METHODS = {'push_back', 'pop_back', 'resize', 'reserve', 'clear', 'insert', 'erase', 'remove'}
+
+def program_uses(node_type, stmts):
+    for stmt in iter_statements(stmts):
+        if isinstance(stmt, node_type):
+            return True
+        if isinstance(stmt, (FunctionNode, ClassNode)) and program_uses(node_type, stmt.body):
+            return True
+    return False
+
+def scoped_blocks(stmt):
+    # child_blocks(stmt) paired with the names each block declares on entry
+    if isinstance(stmt, MatchNode):
+        return [(case.body, [case.var_name] if isinstance(case, MatchCaseNode) else [])
+                for case in stmt.cases]
+    if isinstance(stmt, ParallelForNode):
+        return [(stmt.body, [stmt.var_name])]
+    if isinstance(stmt, ForNode):
+        return [(stmt.body, stmt.var_names)]
+    return [(block, []) for block in child_blocks(stmt)]
+
+def index_names(target):
+    # Names used inside the brackets of an assignment target such as xs[i].a
+    names = set()
+    depth = 0
+    for kind, text in lex(target):
+        if kind == 'LBRACKET':
+            depth += 1
+        elif kind == 'RBRACKET':
+            depth -= 1
+        elif kind == 'ID' and depth > 0:
+            names.add(text)
+    return names
+
+def check_parallel_for(node):
+    # Rejects the obvious data races: writes to variables shared by all
+    # iterations, and element writes whose index is the same in every
+    # iteration, such as xs[0] = ...
+    for op, name in node.reductions:
+        if lookup(name) not in ('int', 'float'):
+            raise Exception(f"Reduction variable '{name}' must be an int or float declared before the parallel for")
+    check_parallel_block(node, node.body, [], [node.var_name])
+
+def check_parallel_block(node, stmts, scopes, declared=()):
+    # scopes: names declared inside the loop, one set per enclosing block
+    scopes.append(set(declared))
+    for stmt in stmts:
+        check_parallel_statement(node, stmt, scopes)
+        if isinstance(stmt, VarDeclNode):
+            scopes[-1].add(stmt.name)
+    scopes.pop()
+
+def check_parallel_statement(node, stmt, scopes):
+    reduced = {name for _, name in node.reductions}
+    is_local = lambda name: any(name in scope for scope in scopes)
+    if isinstance(stmt, ReturnNode):
+        # It would only leave the worker's chunk of iterations
+        raise Exception("'return' is not allowed inside parallel for")
+    if isinstance(stmt, AssignmentNode):
+        target = re.sub(r'\s+', '', stmt.name)
+        root = re.match(r'[a-zA-Z_][a-zA-Z0-9_]*', target).group(0)
+        if target == node.var_name:
+            raise Exception(f"Cannot assign to loop variable '{root}' inside parallel for")
+        if not is_local(root) and root not in reduced:
+            if '[' not in target:
+                raise Exception(f"Data race in parallel for: assignment to outer variable '{target}' "
+                                f"(declare it inside the loop or use reduce(...))")
+            if map_key_value(lookup(root)):
+                raise Exception(f"Data race in parallel for: assignment to outer map '{root}'")
+            if not any(is_local(name) for name in index_names(stmt.name)):
+                raise Exception(f"Data race in parallel for: every iteration writes '{target}' "
+                                f"(index it with the loop variable '{node.var_name}')")
+    for expr in statement_exprs(stmt):
+        tokens = lex(expr)
+        for i in range(1, len(tokens) - 1):
+            if tokens[i - 1][0] == 'DOT' and tokens[i][1] in MUTATING_METHODS and tokens[i + 1][0] == 'LPAREN':
+                root = chain_root(tokens, i - 1)
+                if not is_local(root):
+                    raise Exception(f"Data race in parallel for: '{root}.{tokens[i][1]}(...)' modifies an outer container")
+    for block, declared in scoped_blocks(stmt):
+        check_parallel_block(node, block, scopes, declared)
+
+def generate_parallel_for(node):
+    check_parallel_for(node)
+    if node.iterable is not None and map_key_value(infer_type(node.iterable)):
+        raise Exception("parallel for cannot iterate over a map")
+    if node.iterable is not None:
+        # Bound once so calls and temporaries are evaluated a single time
+        # and outlive the loop.
+        iterable = f"_iter_{node.var_name}"
+        begin, end = "0", f"(long long){iterable}.size()"
+        elem_type = lookup(node.iterable.strip())
+        var_type = elem_type[:-2] if elem_type and elem_type.endswith("[]") else None
+        var_decl = f"auto&& {node.var_name} = {iterable}[_i];"
+    else:
+        begin, end = f"(long long)({translate_expr(node.start)})", f"(long long)({translate_expr(node.end)})"
+        var_type = "int"
+        var_decl = f"int {node.var_name} = (int)_i;"
+
+    identities = {
+        'sum': "{0}{{}}",
+        'min': "std::numeric_limits<{0}>::max()",
+        'max': "std::numeric_limits<{0}>::lowest()",
+    }
+    combines = {
+        'sum': "{0} = {0} + _slot.value;",
+        'min': "{0} = std::min({0}, _slot.value);",
+        'max': "{0} = std::max({0}, _slot.value);",
+    }
+    out = "{\n"
+    if node.iterable is not None:
+        out += f"        auto&& {iterable} = {translate_expr(node.iterable)};\n"
+    for op, name in node.reductions:
+        identity = identities[op].format(f"decltype({name})")
+        out += f"        std::vector<_NovaSlot<decltype({name})>> _red_{name}(_NovaPool::get().size(), {{{identity}}});\n"
+    out += "        _NovaPool::get().run(" + begin + ", " + end + ", [&](long long _lo, long long _hi, int _worker) {\n"
+    for _, name in node.reductions:
+        out += f"        auto {name} = _red_{name}[_worker].value;\n"
+    out += "        for (long long _i = _lo; _i < _hi; ++_i) {\n"
+    out += f"        {var_decl}\n"
+    out += generate_block(node.body, [(var_type, node.var_name)])
+    out += "    }\n"
+    for _, name in node.reductions:
+        out += f"        _red_{name}[_worker].value = {name};\n"
+    out += "        });\n"
+    for op, name in node.reductions:
+        out += f"        for (const auto& _slot : _red_{name}) {combines[op].format(name)}\n"
+    out += "    }"
+    return out
+
 def generate_cpp(node):
     if isinstance(node, ProgramNode):
         structs = []
         functions = []
         classes = []
         main_stmts = []
+        struct_defs.clear()
+        function_types.clear()
+        scopes[:] = [{}]
         for item in node.body:
             if isinstance(item, StructNode):
                 structs.append(item)
+                struct_defs[item.name] = item
             elif isinstance(item, FunctionNode):
                 functions.append(item)
+                function_types[item.name] = item.ret_type
             elif isinstance(item, ClassNode):
                 classes.append(item)
             else:
@@ -562,6 +1445,17 @@ def generate_cpp(node):
         output.append("#include <string>")
         output.append("#include <vector>")
         output.append("#include <variant>")
+        output.append("#include <utility>")
+        output.append("#include <initializer_list>")
+        output.append("#include <algorithm>")
+        output.append("#include <charconv>")
+        output.append("#include <cmath>")
+        output.append("#include <cstdio>")
+        output.append("#include <cstdlib>")
+        output.append("#include <type_traits>")
+        uses_parallel = program_uses(ParallelForNode, node.body)
+        if uses_parallel:
+            output.extend(f"#include {header}" for header in PARALLEL_INCLUDES)
         output.append("using namespace std;")
         output.append("")
         output.append("// Built-in helpers")
@@ -581,24 +1475,121 @@ def generate_cpp(node):
         output.append("    std::visit([](const auto& val) { std::cout << val; }, v);")
         output.append("    std::cout << std::endl;")
         output.append("}")
+        output.append("// String builder: every piece is measured first, so the result is allocated once")
+        output.append("struct _StrPiece {")
+        output.append("    const char* data = nullptr;")
+        output.append("    size_t size = 0;")
+        output.append("    char buf[48];")
+        output.append("    std::string spill;")
+        output.append("    _StrPiece(const std::string& s) : data(s.data()), size(s.size()) {}")
+        output.append("    _StrPiece(const char* s) : data(s), size(std::char_traits<char>::length(s)) {}")
+        output.append("    _StrPiece(char c) : size(1) { buf[0] = c; }")
+        output.append("    _StrPiece(bool b) : _StrPiece((int)b) {}")
+        output.append("    template<typename T, typename = std::enable_if_t<std::is_integral_v<T>>>")
+        output.append("    _StrPiece(T v) { size = std::to_chars(buf, buf + sizeof(buf), v).ptr - buf; }")
+        output.append("    _StrPiece(double v) { format(v); }")
+        output.append("    _StrPiece(float v) {")
+        output.append("        // float * 1e6 is exact in double, so rounding it matches \"%f\" without printf")
+        output.append("        double scaled = std::fabs((double)v) * 1e6;")
+        output.append("        if (!(scaled < 9e18)) { format(v); return; }")
+        output.append("        unsigned long long r = (unsigned long long)std::nearbyint(scaled);")
+        output.append("        char* p = buf;")
+        output.append("        if (std::signbit(v)) *p++ = '-';")
+        output.append("        p = std::to_chars(p, buf + sizeof(buf), r / 1000000).ptr;")
+        output.append("        *p++ = '.';")
+        output.append("        unsigned frac = (unsigned)(r % 1000000);")
+        output.append("        for (int i = 5; i >= 0; --i) { p[i] = (char)('0' + frac % 10); frac /= 10; }")
+        output.append("        size = (p + 6) - buf;")
+        output.append("    }")
+        output.append("    const char* ptr() const { return data ? data : buf; }")
+        output.append("    void format(double v) {")
+        output.append("        int n = std::snprintf(buf, sizeof(buf), \"%f\", v); // same format as std::to_string")
+        output.append("        if (n < (int)sizeof(buf)) size = n;")
+        output.append("        else { spill = std::to_string(v); data = spill.data(); size = spill.size(); }")
+        output.append("    }")
+        output.append("};")
+        output.append("template<class... Ts> std::string _str_cat(const Ts&... parts) {")
+        output.append("    const _StrPiece pieces[] = { _StrPiece(parts)... };")
+        output.append("    size_t total = 0;")
+        output.append("    for (const _StrPiece& p : pieces) total += p.size;")
+        output.append("    std::string out;")
+        output.append("    out.reserve(total);")
+        output.append("    for (const _StrPiece& p : pieces) out.append(p.ptr(), p.size);")
+        output.append("    return out;")
+        output.append("}")
+        output.append("template<class... Ts> void _str_append(std::string& out, const Ts&... parts) {")
+        output.append("    const _StrPiece pieces[] = { _StrPiece(parts)... };")
+        output.append("    size_t total = out.size();")
+        output.append("    for (const _StrPiece& p : pieces) total += p.size;")
+        output.append("    if (total > out.capacity()) out.reserve(std::max(total, 2 * out.capacity()));")
+        output.append("    for (const _StrPiece& p : pieces) out.append(p.ptr(), p.size);")
+        output.append("}")
+        output.append("// Element-wise array kernels. Work is done in blocks of 8 through a local buffer")
+        output.append("// (or 8 accumulators for sums) so the C++ compiler can vectorise the loop.")
+        output.append("inline size_t _ew_len(std::initializer_list<size_t> sizes, const char* expr) {")
+        output.append("    size_t n = *sizes.begin();")
+        output.append("    for (size_t s : sizes) {")
+        output.append("        if (s != n) { std::cerr << \"Array length mismatch in '\" << expr << \"'\" << std::endl; std::exit(1); }")
+        output.append("    }")
+        output.append("    return n;")
+        output.append("}")
+        output.append("template<class T, class F> void _ew_fill(std::vector<T>& out, size_t n, F f) {")
+        output.append("    out.resize(n);")
+        output.append("    T* o = out.data();")
+        output.append("    size_t k = 0;")
+        output.append("    for (; k + 8 <= n; k += 8) {")
+        output.append("        T t[8];")
+        output.append("        for (size_t j = 0; j < 8; ++j) t[j] = f(k + j);")
+        output.append("        for (size_t j = 0; j < 8; ++j) o[k + j] = t[j];")
+        output.append("    }")
+        output.append("    for (; k < n; ++k) o[k] = f(k);")
+        output.append("}")
+        output.append("template<class F> auto _ew_map(size_t n, F f) {")
+        output.append("    std::vector<decltype(f(0))> out;")
+        output.append("    _ew_fill(out, n, f);")
+        output.append("    return out;")
+        output.append("}")
+        output.append("template<class F> auto _ew_sum(size_t n, F f) {")
+        output.append("    using T = decltype(f(0));")
+        output.append("    T acc[8] = {};")
+        output.append("    size_t k = 0;")
+        output.append("    for (; k + 8 <= n; k += 8)")
+        output.append("        for (size_t j = 0; j < 8; ++j) acc[j] += f(k + j);")
+        output.append("    T total = T{};")
+        output.append("    for (; k < n; ++k) total += f(k);")
+        output.append("    for (size_t j = 0; j < 8; ++j) total += acc[j];")
+        output.append("    return total;")
+        output.append("}")
+        output.append("template<class T> T _ew_sum_of(const std::vector<T>& v) {")
+        output.append("    return _ew_sum(v.size(), [&](size_t k) { return v[k]; });")
+        output.append("}")
+        output.append("template<class A, class B> auto _ew_dot(const std::vector<A>& a, const std::vector<B>& b) {")
+        output.append("    size_t n = _ew_len({a.size(), b.size()}, \"dot\");")
+        output.append("    return _ew_sum(n, [&](size_t k) { return a[k] * b[k]; });")
+        output.append("}")
         output.append("template<typename T> void _print_simple(const T& val) {")
         output.append("    std::cout << val << std::endl;")
         output.append("}")
+        output.append("template<typename T> void _print_variant(const T& val) {")
+        output.append("    _print_simple(val);")
+        output.append("}")
+        if uses_parallel:
+            output.append(PARALLEL_RUNTIME)
         output.append("")
+        runtime_at = len(output)
         output.append(f"namespace {node.name} {{")
         
         # Structs first
         for s in structs:
-             output.append(f"    struct {s.name} {{")
-             for f_type, f_name in s.fields:
-                 output.append(f"        {map_type(f_type)} {f_name};")
-             output.append("    };")
+             output.append(generate_struct(s))
              output.append("")
         
         # Classes (currently treated like namespaces with functions)
         for c in classes:
             output.append(generate_cpp(c))
 
+        function_info.clear()
+        function_info.update(analyze_functions(functions))
         for func in functions:
             output.append(generate_cpp(func))
         
@@ -612,6 +1603,9 @@ def generate_cpp(node):
         output.append(f"    {node.name}::_main();")
         output.append("    return 0;")
         output.append("}")
+        if any("_NovaMap<" in line for line in output[runtime_at:]):
+            output[runtime_at:runtime_at] = [MAP_RUNTIME, ""]
+            output[:0] = [f"#include {header}" for header in MAP_INCLUDES]
         return "\n".join(output)
 
     elif isinstance(node, ClassNode):
@@ -634,18 +1628,29 @@ def generate_cpp(node):
     elif isinstance(node, FunctionNode):
         ret_type = "void" if node.ret_type == "void" else map_type(node.ret_type)
         args_str = ", ".join([f"{map_type(typ)} {nm}" for typ, nm in node.args])
-        code = f"    {ret_type} {node.name}({args_str}) {{\n"
-        for stmt in node.body:
-            code += "        " + generate_cpp(stmt) + "\n"
+        info = function_info.get(node.name)
+        specifier = ""
+        if info and info.node is node:
+            if info.constexpr:
+                specifier = "constexpr "
+            elif info.inline:
+                specifier = "inline "
+        code = f"    {specifier}{ret_type} {node.name}({args_str}) {{\n"
+        code += generate_block(node.body, node.args)
         code += "    }"
         return code
 
     elif isinstance(node, VarDeclNode):
         cpp_type = map_type(node.type_name)
+        if node.value_expr and node.type_name in NUMERIC_ARRAY_TYPES and is_elementwise(lower_array_builtins(node.value_expr)):
+            declare(node.name, node.type_name)
+            return f"{cpp_type} {node.name}; {elementwise_fill(node.name, node.value_expr)}"
         if node.value_expr:
             val = translate_expr(node.value_expr)
+            declare(node.name, node.type_name)
             return f"{cpp_type} {node.name} = {val};"
         else:
+            declare(node.name, node.type_name)
             return f"{cpp_type} {node.name};"
 
     elif isinstance(node, ReturnNode):
@@ -659,10 +1664,24 @@ def generate_cpp(node):
         # name that could be a variant, we use the variant printer.
         if re.match(r'^[a-zA-Z_][a-zA-Z0-9_]*$', val.strip()):
              return f"_print_variant({val});" # Try to print as variant
+        if len(split_type(infer_type(node.expr) or "", '|')) > 1:
+             return f"_print_variant({val});" # e.g. a union value read from a map
         return f"_print_simple({val});" # Print as a simple value
     elif isinstance(node, AssignmentNode):
+        if lookup(node.name) in NUMERIC_ARRAY_TYPES and is_elementwise(lower_array_builtins(node.expr)):
+            # Writes into the existing buffer instead of a temporary
+            return elementwise_fill(node.name, node.expr)
         val = translate_expr(node.expr)
         # AssignmentNode now holds full LHS string in name
+        append_parts = string_append_parts(node.name, val)
+        if append_parts:
+            # s = s + ... grows s in place instead of rebuilding it
+            return f"_str_append({node.name}, {append_parts});"
+        root = re.match(r'\s*([a-zA-Z_][a-zA-Z0-9_]*)', node.name).group(1)
+        if '[' in node.name and map_key_value(lookup(root)):
+            # Inserting can grow the table, which would move a value the
+            # right side still refers to (m[a] = m[b]); evaluate it first.
+            return f"{{ std::decay_t<decltype({node.name})> _v = {val}; {node.name} = std::move(_v); }}"
         return f"{node.name} = {val};"
     
     elif isinstance(node, ExpressionNode):
@@ -672,24 +1691,27 @@ def generate_cpp(node):
     elif isinstance(node, IfNode):
         cond = translate_expr(node.condition)
         out = f"if ({cond}) {{\n"
-        for stmt in node.if_body:
-            out += "        " + generate_cpp(stmt) + "\n"
+        out += generate_block(node.if_body)
         out += "    }"
         if node.else_body is not None:
             out += " else {\n"
-            for stmt in node.else_body:
-                out += "        " + generate_cpp(stmt) + "\n"
+            out += generate_block(node.else_body)
             out += "    }"
         return out
         
     elif isinstance(node, WhileNode):
         cond = translate_expr(node.condition)
         out = f"while ({cond}) {{\n"
-        for stmt in node.body:
-            out += "        " + generate_cpp(stmt) + "\n"
+        out += generate_block(node.body)
         out += "    }"
         return out
 
+    elif isinstance(node, ParallelForNode):
+        return generate_parallel_for(node)
+
+    elif isinstance(node, ForNode):
+        return generate_for(node)
+
     elif isinstance(node, MatchNode):
         expr = translate_expr(node.expr)
         # We generate a C++ lambda for std::visit
@@ -699,11 +1721,10 @@ def generate_cpp(node):
         for i, case in enumerate(node.cases):
             if isinstance(case, MatchDefaultCaseNode):
                 out += "    else {\n"
-                for stmt in case.body:
-                    out += "        " + generate_cpp(stmt) + "\n"
+                out += generate_block(case.body)
                 out += "    }"
             elif isinstance(case, MatchCaseNode):
-                types = case.types.split('|')
+                types = split_type(case.types, '|')
                 conditions = [f"std::is_same_v<T, {map_type(t)}>" for t in types]
                 
                 if_or_else_if = "if" if i == 0 else " else if"
@@ -716,8 +1737,8 @@ def generate_cpp(node):
                 var_type = "float" if has_int and has_float else "auto"
 
                 out += f"        {var_type} {case.var_name} = arg;\n"
-                for stmt in case.body:
-                    out += "        " + generate_cpp(stmt) + "\n"
+                case_type = "float" if var_type == "float" else case.types
+                out += generate_block(case.body, [(case_type, case.var_name)])
                 out += "    }"
         
         out += f"\n}}, {expr});"
@@ -745,17 +1766,692 @@ def translate_expr(expr_str):
         if match_str:
             return re.sub(pattern_str, "_input_str(", expr_str, 1)
 
-    # Handle string() type casting
-    expr_str = re.sub(r'\bstring\s*\((.*?)\)', r'std::to_string(\1)', expr_str)
+    # Whole-array arithmetic, sum() and dot()
+    expr_str = lower_elementwise(lower_array_builtins(expr_str), expr_str)
+
+    # Concatenation chains and string() conversions
+    if options['string_builder']:
+        expr_str = lower_string_concat(expr_str)
+    else:
+        expr_str = re.sub(r'\bstring\s*\((.*?)\)', r'std::to_string(\1)', expr_str)
+
+    # m[key] reads fail on missing keys instead of inserting them
+    expr_str = lower_map_reads(expr_str)
+
+    # Calls to constexpr functions with constant arguments
+    expr_str = fold_constant_calls(expr_str)
 
     return expr_str
 
+# --- Expression helpers ---
+
+OPENERS = {'(': ')', '[': ']', '{': '}'}
+COMPARISON_TOKENS = {'EQ', 'NEQ', 'LTE', 'GTE', 'LT', 'GT'}
+
+def find_close(text, start):
+    # Index of the bracket closing text[start], skipping string literals.
+    depth = 0
+    i = start
+    while i < len(text):
+        c = text[i]
+        if c == '"':
+            i = text.index('"', i + 1)
+        elif c in OPENERS:
+            depth += 1
+        elif c in OPENERS.values():
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise Exception(f"Unbalanced brackets in expression: {text}")
+
+def split_top_level(text, separators):
+    # Splits text at separator characters outside brackets and string literals.
+    parts = []
+    start = 0
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c == '"':
+            i = text.index('"', i + 1)
+        elif c in OPENERS:
+            i = find_close(text, i)
+        elif c in separators:
+            parts.append(text[start:i])
+            start = i + 1
+        i += 1
+    parts.append(text[start:])
+    return parts
+
+def token_close(tokens, start):
+    # Index of the token closing the bracket token at tokens[start].
+    depth = 0
+    for i in range(start, len(tokens)):
+        if tokens[i][0] in ('LPAREN', 'LBRACKET', 'LBRACE'):
+            depth += 1
+        elif tokens[i][0] in ('RPAREN', 'RBRACKET', 'RBRACE'):
+            depth -= 1
+            if depth == 0:
+                return i
+    return None
+
+def top_level_tokens(tokens):
+    i = 0
+    while i < len(tokens):
+        yield tokens[i]
+        if tokens[i][0] in ('LPAREN', 'LBRACKET', 'LBRACE'):
+            i = token_close(tokens, i)
+            if i is None:
+                return
+        i += 1
+
+def infer_type(expr):
+    # Best-effort Nova type of a translated expression, or None if unknown.
+    expr = expr.strip()
+    operands = [op for op in split_top_level(expr, '+-*/') if op.strip()]
+    if len(operands) > 1:
+        types = [infer_type(op) for op in operands]
+        if 'string' in types:
+            return 'string'
+        if None in types or any(t not in ('int', 'float') for t in types):
+            return None
+        return 'float' if 'float' in types else 'int'
+
+    tokens = lex(expr)
+    if not tokens or any(t[0] in COMPARISON_TOKENS for t in top_level_tokens(tokens)):
+        return None
+    kind, text = tokens[0]
+    if len(tokens) == 1 and kind == 'STRING':
+        return 'string'
+    if len(tokens) == 1 and kind == 'NUMBER':
+        return 'int'
+    if kind == 'FLOAT' and (len(tokens) == 1 or tokens[1:] == [('ID', 'f')]):
+        return 'float'
+    if kind == 'LPAREN' and token_close(tokens, 0) == len(tokens) - 1:
+        return infer_type(expr[expr.index('(') + 1:expr.rindex(')')])
+    if kind == 'STRING_TYPE' and len(tokens) > 1 and tokens[1][0] == 'LPAREN':
+        return 'string' if token_close(tokens, 1) == len(tokens) - 1 else None
+    if kind != 'ID':
+        return None
+
+    # ID, call, then a chain of [index] and .field suffixes
+    i = 1
+    if i < len(tokens) and tokens[i][0] == 'LPAREN':
+        t = function_types.get(text) or BUILTIN_TYPES.get(text)
+        i = token_close(tokens, i)
+        if i is None:
+            return None
+        i += 1
+    else:
+        t = lookup(text)
+    while t and i < len(tokens):
+        if tokens[i][0] == 'LBRACKET':
+            if map_key_value(t):
+                t = map_key_value(t)[1]
+            else:
+                t = t[:-2] if t.endswith("[]") else None
+            i = token_close(tokens, i)
+            if i is None:
+                return None
+            i += 1
+        elif tokens[i][0] == 'DOT' and i + 1 < len(tokens) and t in struct_defs:
+            fields = {f_name: f_type for f_type, f_name in struct_defs[t].fields}
+            t = fields.get(tokens[i + 1][1])
+            i += 2
+        else:
+            return None
+    return t
+
+# --- Element-wise arrays ---
+
+# Arrays that support whole-array arithmetic: a + b, a * 2.0, sum(a), dot(a, b)
+NUMERIC_ARRAY_TYPES = {'int[]', 'float[]'}
+
+def scan_array_refs(expr):
+    # Bare references to numeric arrays in expr as (start, end, name, in_call).
+    # in_call is set for arrays passed as arguments to a call.
+    refs = []
+    calls = [] # For each open bracket: is it a call's argument list?
+    i = 0
+    while i < len(expr):
+        c = expr[i]
+        if c == '"':
+            i = expr.index('"', i + 1) + 1
+            continue
+        if c in OPENERS:
+            before = expr[:i].rstrip()
+            calls.append(c == '(' and bool(re.search(r'\w$', before)))
+        elif c in OPENERS.values():
+            calls.pop()
+        m = re.match(r'[a-zA-Z_][a-zA-Z0-9_]*', expr[i:])
+        if m and (i == 0 or not re.match(r'[\w]', expr[i - 1])):
+            end = i + m.end()
+            before = expr[:i].rstrip()
+            after = expr[end:].lstrip()
+            bare = not before.endswith('.') and not after[:1] in ('[', '.', '(')
+            if bare and lookup(m.group(0)) in NUMERIC_ARRAY_TYPES:
+                refs.append((i, end, m.group(0), any(calls)))
+            i = end
+            continue
+        i += 1
+    return refs
+
+def is_elementwise(expr):
+    # True for arithmetic over whole arrays, e.g. `a + b * 2.0f`.
+    # Arrays passed to calls are whole values and do not count.
+    if not any(not in_call for _, _, _, in_call in scan_array_refs(expr)):
+        return False
+    return any(t[0] in ('PLUS', 'MINUS', 'STAR', 'SLASH') for t in top_level_tokens(lex(expr)))
+
+def lower_elementwise(expr, label=None):
+    # Whole-array arithmetic in call arguments first, e.g. total(a + b),
+    # then the expression itself
+    expr = lower_elementwise_args(expr)
+    if is_elementwise(expr):
+        length, element, hoisted = elementwise_kernel(expr, label)
+        return with_hoisted(f"_ew_map({length}, [&](size_t _k) {{ return {element}; }})", hoisted)
+    return expr
+
+def lower_elementwise_args(expr):
+    out = []
+    i = 0
+    while i < len(expr):
+        c = expr[i]
+        if c == '"':
+            end = expr.index('"', i + 1)
+            out.append(expr[i:end + 1])
+            i = end + 1
+        elif c == '(':
+            end = find_close(expr, i)
+            is_call = bool(re.search(r'\w$', expr[:i].rstrip()))
+            lower = lower_elementwise if is_call else lower_elementwise_args
+            inner = split_top_level(expr[i + 1:end], ',')
+            out.append("(" + ",".join(lower(part) for part in inner) + ")")
+            i = end + 1
+        else:
+            out.append(c)
+            i += 1
+    return "".join(out)
+
+def elementwise_kernel(expr, label=None):
+    # (length expression, per-element expression using index _k, hoisted)
+    # hoisted lists the (name, value) operands computed once before the loop.
+    message = re.sub(r'\s+', ' ', label or expr).strip().replace('"', '\\"')
+    hoisted = []
+    expr = hoist_scalars(expr, hoisted, 1 + max(map(int, re.findall(r'\b_s(\d+)\b', expr)), default=-1))
+    refs = [ref for ref in scan_array_refs(expr) if not ref[3]]
+    names = list(dict.fromkeys(name for _, _, name, _ in refs))
+    if len(names) == 1:
+        length = f"{names[0]}.size()"
+    else:
+        sizes = ", ".join(f"{name}.size()" for name in names)
+        length = f"_ew_len({{{sizes}}}, \"{message}\")"
+    element = expr
+    for start, end, name, _ in reversed(refs):
+        element = element[:start] + f"{name}[_k]" + element[end:]
+    return length, element.strip(), hoisted
+
+def hoist_scalars(expr, hoisted, first):
+    # Replaces the operands of + - * / that involve no whole array, such as
+    # a[0], sum(b) or f(x), with _sN names. They are then evaluated once,
+    # before the loop writes into the target array.
+    out = []
+    start = 0
+    i = 0
+    while i <= len(expr):
+        c = expr[i] if i < len(expr) else None
+        if c == '"':
+            i = expr.index('"', i + 1)
+        elif c in OPENERS:
+            i = find_close(expr, i)
+        elif c is None or c in '+-*/':
+            out.append(hoist_operand(expr[start:i], hoisted, first))
+            out.append(c or "")
+            start = i + 1
+        i += 1
+    return "".join(out)
+
+def hoist_operand(operand, hoisted, first):
+    text = operand.strip()
+    if not text or re.fullmatch(r'[a-zA-Z_][a-zA-Z0-9_]*|[0-9.]+f?', text):
+        return operand
+    if all(in_call for _, _, _, in_call in scan_array_refs(text)):
+        name = f"_s{first + len(hoisted)}"
+        hoisted.append((name, text))
+        return f" {name} "
+    if text[0] == '(' and find_close(text, 0) == len(text) - 1:
+        return f" ( {hoist_scalars(text[1:-1], hoisted, first)} ) "
+    return operand
+
+def hoisted_decls(hoisted):
+    return "".join(f"const auto {name} = {value}; " for name, value in hoisted)
+
+def with_hoisted(call, hoisted):
+    # An expression that evaluates the hoisted operands, then call
+    if not hoisted:
+        return call
+    return f"[&] {{ {hoisted_decls(hoisted)}return {call}; }}()"
+
+def elementwise_fill(target, expr):
+    length, element, hoisted = elementwise_kernel(lower_elementwise_args(lower_array_builtins(expr)), expr)
+    kernel = f"{length}, [&](size_t _k) {{ return {element}; }}"
+    if re.search(rf'\b{target}\b', element.replace(f"{target}[_k]", "")):
+        # The target is read at other indices: build the result separately
+        fill = f"{target} = _ew_map({kernel});"
+    else:
+        fill = f"_ew_fill({target}, {kernel});"
+    return f"{{ {hoisted_decls(hoisted)}{fill} }}" if hoisted else fill
+
+def lower_array_builtins(expr):
+    # sum(x) and dot(x, y) become single-pass reductions over x (and y)
+    out = []
+    pos = 0
+    for m in re.finditer(r'(?<![\w.])(sum|dot)\s*\(', expr):
+        if m.start() < pos or m.group(1) in function_types or expr[:m.start()].count('"') % 2:
+            continue
+        end = find_close(expr, m.end() - 1)
+        args = [lower_array_builtins(a.strip()) for a in split_top_level(expr[m.end():end], ',')]
+        if m.group(1) == 'sum':
+            if len(args) != 1:
+                raise Exception(f"sum() takes one array, got {len(args)} arguments")
+            body = args[0]
+        else:
+            if len(args) != 2:
+                raise Exception(f"dot() takes two arrays, got {len(args)} arguments")
+            body = f"({args[0]}) * ({args[1]})"
+        if is_elementwise(body) or (len(scan_array_refs(body)) == 1 and body == scan_array_refs(body)[0][2]):
+            label = re.sub(r'\s+', ' ', expr[m.start():end + 1])
+            length, element, hoisted = elementwise_kernel(body, label)
+            call = with_hoisted(f"_ew_sum({length}, [&](size_t _k) {{ return {element}; }})", hoisted)
+        elif m.group(1) == 'sum':
+            call = f"_ew_sum_of({args[0]})"
+        else:
+            call = f"_ew_dot({args[0]}, {args[1]})"
+        out.append(expr[pos:m.start()])
+        out.append(call)
+        pos = end + 1
+    out.append(expr[pos:])
+    return "".join(out)
+
+# --- Maps ---
+
+def lower_map_reads(expr):
+    # m [ k ] -> m.at(k) for map variables m
+    out = []
+    pos = 0
+    for m in re.finditer(r'(?<![\w.])([a-zA-Z_][a-zA-Z0-9_]*)\s*\[', expr):
+        if m.start() < pos or not map_key_value(lookup(m.group(1))) or expr[:m.start()].count('"') % 2:
+            continue
+        end = find_close(expr, m.end() - 1)
+        out.append(expr[pos:m.start()])
+        out.append(f"{m.group(1)}.at({lower_map_reads(expr[m.end():end].strip())})")
+        pos = end + 1
+    out.append(expr[pos:])
+    return "".join(out)
+
+def generate_for(node):
+    if node.iterable is None:
+        var = node.var_names[0]
+        start, end = translate_expr(node.start), translate_expr(node.end)
+        out = f"for (int {var} = {start}, _end_{var} = {end}; {var} < _end_{var}; ++{var}) {{\n"
+        declared = [("int", var)]
+    else:
+        iterable = translate_expr(node.iterable)
+        iter_type = infer_type(node.iterable)
+        if map_key_value(iter_type):
+            key_type, value_type = map_key_value(iter_type)
+            entry = f"_entry_{node.var_names[0]}"
+            out = f"for (auto& {entry} : {iterable}) {{\n"
+            out += f"        [[maybe_unused]] const auto& {node.var_names[0]} = {entry}.key;\n"
+            declared = [(key_type, node.var_names[0])]
+            if len(node.var_names) > 1:
+                out += f"        [[maybe_unused]] auto& {node.var_names[1]} = {entry}.value;\n"
+                declared.append((value_type, node.var_names[1]))
+        else:
+            if len(node.var_names) > 1:
+                raise Exception(f"'for ({', '.join(node.var_names)} in ...)' needs a map")
+            var = node.var_names[0]
+            elem_type = iter_type[:-2] if iter_type and iter_type.endswith("[]") else None
+            declared = [(elem_type, var)]
+            if elem_type in struct_defs and struct_defs[elem_type].soa:
+                # Name_soa has no iterators; elements are Name_ref proxies
+                out = "{\n"
+                out += f"        auto&& _iter_{var} = {iterable};\n"
+                out += f"        for (size_t _i_{var} = 0; _i_{var} < _iter_{var}.size(); ++_i_{var}) {{\n"
+                out += f"        auto&& {var} = _iter_{var}[_i_{var}];\n"
+                out += generate_block(node.body, declared)
+                out += "    }\n"
+                out += "    }"
+                return out
+            out = f"for (auto&& {var} : {iterable}) {{\n"
+    out += generate_block(node.body, declared)
+    out += "    }"
+    return out
+
+# --- Constant folding ---
+
+# Calls to constexpr functions with constant arguments are evaluated here and
+# replaced by their result. Evaluation gives up after this many steps and the
+# call is left to run (or be folded by the C++ compiler) as usual.
+FOLD_STEP_BUDGET = 200000
+INT_MIN, INT_MAX = -2**31, 2**31 - 1
+
+class NotConstant(Exception):
+    pass
+
+def to_float32(v):
+    try:
+        return struct.unpack('f', struct.pack('f', v))[0]
+    except OverflowError:
+        raise NotConstant()
+
+def convert(v, type_name):
+    # Value as stored in a C++ variable of the given Nova type
+    if type_name == 'float':
+        return to_float32(float(v))
+    if isinstance(v, float):
+        if v != v or abs(v) >= 2**31:
+            raise NotConstant()
+        v = int(v) # truncates toward zero like C++
+    if not INT_MIN <= v <= INT_MAX:
+        raise NotConstant()
+    return v
+
+class ConstEvaluator:
+    def __init__(self, infos):
+        self.infos = infos
+        self.steps = 0
+        self.cache = {}
+        self.token_cache = {}
+
+    def step(self):
+        self.steps += 1
+        if self.steps > FOLD_STEP_BUDGET:
+            raise NotConstant()
+
+    def call(self, name, args):
+        info = self.infos.get(name)
+        if not info or not info.constexpr or len(args) != len(info.node.args):
+            raise NotConstant()
+        args = tuple(convert(v, t) for v, (t, _) in zip(args, info.node.args))
+        if (name, args) not in self.cache:
+            self.step()
+            env = [{arg_name: (t, v) for v, (t, arg_name) in zip(args, info.node.args)}]
+            result = self.exec_block(info.node.body, env)
+            if result is None:
+                raise NotConstant()
+            self.cache[(name, args)] = convert(result[0], info.node.ret_type)
+        return self.cache[(name, args)]
+
+    def exec_block(self, stmts, env):
+        # Returns (value,) when a return statement ran, otherwise None.
+        # env is a list of scopes, {name: (type, value)}, innermost last.
+        env.append({})
+        try:
+            return self.exec_statements(stmts, env)
+        finally:
+            env.pop()
+
+    def exec_statements(self, stmts, env):
+        for stmt in stmts:
+            self.step()
+            if isinstance(stmt, VarDeclNode):
+                env[-1][stmt.name] = (stmt.type_name, convert(self.eval(stmt.value_expr, env), stmt.type_name))
+            elif isinstance(stmt, AssignmentNode):
+                scope = self.scope_of(stmt.name, env)
+                if scope is None:
+                    raise NotConstant()
+                type_name = scope[stmt.name][0]
+                scope[stmt.name] = (type_name, convert(self.eval(stmt.expr, env), type_name))
+            elif isinstance(stmt, ReturnNode):
+                return (self.eval(stmt.expr, env),)
+            elif isinstance(stmt, ExpressionNode):
+                self.eval(stmt.text, env)
+            elif isinstance(stmt, IfNode):
+                body = stmt.if_body if self.eval(stmt.condition, env) else (stmt.else_body or [])
+                result = self.exec_block(body, env)
+                if result:
+                    return result
+            elif isinstance(stmt, WhileNode):
+                while self.eval(stmt.condition, env):
+                    self.step()
+                    result = self.exec_block(stmt.body, env)
+                    if result:
+                        return result
+            else:
+                raise NotConstant()
+        return None
+
+    def scope_of(self, name, env):
+        for scope in reversed(env):
+            if name in scope:
+                return scope
+        return None
+
+    def eval(self, expr, env):
+        if expr not in self.token_cache:
+            tokens = lex(expr)
+            self.token_cache[expr] = [t for i, t in enumerate(tokens)
+                                      if not (t == ('ID', 'f') and i > 0 and tokens[i - 1][0] == 'FLOAT')]
+        self.tokens, self.pos, self.env = self.token_cache[expr], 0, env
+        value = self.comparison()
+        if self.pos != len(self.tokens):
+            raise NotConstant()
+        return value
+
+    def peek_kind(self):
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def take(self, kind=None):
+        if self.pos >= len(self.tokens) or (kind and self.tokens[self.pos][0] != kind):
+            raise NotConstant()
+        self.pos += 1
+        return self.tokens[self.pos - 1]
+
+    def comparison(self):
+        left = self.additive()
+        ops = {'EQ': lambda a, b: a == b, 'NEQ': lambda a, b: a != b,
+               'LT': lambda a, b: a < b, 'GT': lambda a, b: a > b,
+               'LTE': lambda a, b: a <= b, 'GTE': lambda a, b: a >= b}
+        while self.peek_kind() in ops:
+            op = ops[self.take()[0]]
+            left = int(op(*self.promote(left, self.additive())))
+        return left
+
+    def additive(self):
+        left = self.term()
+        while self.peek_kind() in ('PLUS', 'MINUS'):
+            kind = self.take()[0]
+            right = self.term()
+            left = self.arith(left, right, lambda a, b: a + b if kind == 'PLUS' else a - b)
+        return left
+
+    def term(self):
+        left = self.unary()
+        while self.peek_kind() in ('STAR', 'SLASH'):
+            kind = self.take()[0]
+            right = self.unary()
+            if kind == 'STAR':
+                left = self.arith(left, right, lambda a, b: a * b)
+            elif isinstance(left, float) or isinstance(right, float):
+                if right == 0:
+                    raise NotConstant()
+                left, right = self.promote(left, right)
+                left = to_float32(left / right)
+            else:
+                if right == 0:
+                    raise NotConstant()
+                q = abs(left) // abs(right)
+                left = convert(q if (left < 0) == (right < 0) else -q, 'int')
+        return left
+
+    def promote(self, a, b):
+        # Mixed int/float operands: C++ converts the int to float first.
+        if isinstance(a, float) or isinstance(b, float):
+            return to_float32(float(a)), to_float32(float(b))
+        return a, b
+
+    def arith(self, a, b, op):
+        if isinstance(a, float) or isinstance(b, float):
+            a, b = self.promote(a, b)
+            return to_float32(op(a, b))
+        return convert(op(a, b), 'int')
+
+    def unary(self):
+        if self.peek_kind() == 'MINUS':
+            self.take()
+            value = self.unary()
+            return to_float32(-value) if isinstance(value, float) else convert(-value, 'int')
+        return self.primary()
+
+    def primary(self):
+        kind, text = self.take()
+        if kind == 'NUMBER':
+            return convert(int(text), 'int')
+        if kind == 'FLOAT':
+            return to_float32(float(text))
+        if kind == 'LPAREN':
+            value = self.comparison()
+            self.take('RPAREN')
+            return value
+        if kind in ('INT_TYPE', 'FLOAT_TYPE'):
+            self.take('LPAREN')
+            value = self.comparison()
+            self.take('RPAREN')
+            return convert(value, text)
+        if kind == 'ID' and self.peek_kind() == 'LPAREN':
+            self.take('LPAREN')
+            args = []
+            while self.peek_kind() != 'RPAREN':
+                args.append(self.comparison())
+                if self.peek_kind() != 'COMMA':
+                    break
+                self.take('COMMA')
+            self.take('RPAREN')
+            saved = (self.tokens, self.pos, self.env)
+            value = self.call(text, args)
+            self.tokens, self.pos, self.env = saved
+            return value
+        if kind == 'ID' and self.scope_of(text, self.env) is not None:
+            return self.scope_of(text, self.env)[text][1]
+        raise NotConstant()
+
+def format_constant(value):
+    if isinstance(value, float):
+        if value != value or value in (float('inf'), float('-inf')):
+            raise NotConstant()
+        text = '%.9g' % value
+        if '.' not in text and 'e' not in text:
+            text += '.0'
+        text += 'f'
+    else:
+        text = str(value)
+    return f"({text})" if text.startswith('-') else text
+
+def fold_constant_calls(expr):
+    # f(3, 4.0) -> its result, when f is constexpr and the arguments are constant
+    out = []
+    pos = 0
+    for m in re.finditer(r'(?<![\w.])([a-zA-Z_][a-zA-Z0-9_]*)\s*\(', expr):
+        info = function_info.get(m.group(1))
+        if m.start() < pos or not info or not info.constexpr or expr[:m.start()].count('"') % 2:
+            continue
+        end = find_close(expr, m.end() - 1)
+        try:
+            value = ConstEvaluator(function_info).eval(expr[m.start():end + 1], [])
+            literal = format_constant(convert(value, info.node.ret_type))
+        except (NotConstant, RecursionError):
+            continue
+        out.append(expr[pos:m.start()])
+        out.append(literal)
+        pos = end + 1
+    out.append(expr[pos:])
+    return "".join(out)
+
+# --- String building ---
+
+def string_conversion_arg(operand):
+    # "string ( x )" -> "x", otherwise None
+    m = re.match(r'\s*string\s*\(', operand)
+    if m and find_close(operand, m.end() - 1) == len(operand.rstrip()) - 1:
+        return operand[m.end():len(operand.rstrip()) - 1].strip()
+    return None
+
+def lower_string_concat(expr):
+    # Rewrites `a + b + ...` chains with a string operand to one _str_cat call,
+    # which sizes the result once and formats numbers without temporaries.
+    out = []
+    i = 0
+    while i < len(expr):
+        c = expr[i]
+        if c == '"':
+            end = expr.index('"', i + 1)
+            out.append(expr[i:end + 1])
+            i = end + 1
+        elif c in OPENERS:
+            end = find_close(expr, i)
+            inner = split_top_level(expr[i + 1:end], ',')
+            out.append(c + ",".join(lower_string_concat(part) for part in inner) + expr[end])
+            i = end + 1
+        else:
+            out.append(c)
+            i += 1
+    expr = "".join(out)
+
+    operands = split_top_level(expr, '+')
+    if len(operands) == 1:
+        arg = string_conversion_arg(expr)
+        return f"_str_cat({arg})" if arg is not None else expr
+    if any(not op.strip() for op in operands):
+        return expr
+    if any(t[0] in COMPARISON_TOKENS for op in operands for t in top_level_tokens(lex(op))):
+        return expr
+
+    types = [infer_type(op) for op in operands]
+    if 'string' not in types:
+        return expr
+    first = types.index('string')
+    if first > 1:
+        # Operands before the first string are added up as numbers
+        operands = ["(" + "+".join(operands[:first]).strip() + ")"] + operands[first:]
+    pieces = []
+    for op in operands:
+        arg = string_conversion_arg(op)
+        pieces.append(arg if arg is not None else op.strip())
+    return f"_str_cat({', '.join(pieces)})"
+
+def string_append_parts(lhs, val):
+    # For `s = s + ...` returns the appended pieces, or None.
+    m = re.match(r'_str_cat\((.*)\)$', val.strip())
+    if not m or find_close(val.strip(), len('_str_cat')) != len(val.strip()) - 1:
+        return None
+    pieces = [p.strip() for p in split_top_level(m.group(1), ',')]
+    target = re.sub(r'\s+', '', lhs)
+    if len(pieces) < 2 or re.sub(r'\s+', '', pieces[0]) != target:
+        return None
+    # Appending s to itself would read from a buffer the append reallocates
+    root = re.match(r'[a-zA-Z_][a-zA-Z0-9_]*', target).group(0)
+    if any(re.search(rf'\b{root}\b', p) for p in pieces[1:]):
+        return None
+    return ", ".join(pieces[1:])
+
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python compiler.py <file>", file=sys.stderr)
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    flags = [a for a in sys.argv[1:] if a.startswith('--')]
+    usage = "Usage: python compiler.py <file> [--no-string-builder] [--report-pure]"
+    if len(args) != 1:
+        print(usage, file=sys.stderr)
         sys.exit(1)
+    for flag in flags:
+        if flag == '--no-string-builder':
+            options['string_builder'] = False
+        elif flag == '--report-pure':
+            options['report_pure'] = True
+        else:
+            print(f"Unknown option '{flag}'. {usage}", file=sys.stderr)
+            sys.exit(1)
 
-    filepath = sys.argv[1]
+    filepath = args[0]
         
     if not os.path.exists(filepath):
         print(f"Error: File '{filepath}' not found.", file=sys.stderr)
@@ -775,6 +2471,8 @@ def main():
         program_ast = ProgramNode(module_name, statements)
         cpp_code = generate_cpp(program_ast)
         print(cpp_code)
+        if options['report_pure']:
+            print(purity_report(function_info), file=sys.stderr)
     except Exception as e:
         print(f"Compilation Error: {e}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,46 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Helpers for tests that compile Nova programs, build them with g++ and run them.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+COMPILER = os.path.join(HERE, "..", "compiler", "compiler.py")
+CXX = os.environ.get("CXX", "g++")
+HAS_CXX = shutil.which(CXX) is not None
+
+def transpile(source, flags=()):
+    # (returncode, C++ source or the compiler's error message)
+    with tempfile.TemporaryDirectory() as workdir:
+        nova_path = os.path.join(workdir, "program.nova")
+        with open(nova_path, "w") as f:
+            f.write(source)
+        result = subprocess.run([sys.executable, COMPILER, nova_path] + list(flags),
+                                capture_output=True, text=True)
+    return result.returncode, result.stdout if result.returncode == 0 else result.stderr
+
+def run(source, flags=(), stdin="", env=None):
+    # Transpiles, builds and runs source; returns the finished process.
+    returncode, cpp = transpile(source, flags)
+    if returncode != 0:
+        raise AssertionError(f"Nova compilation failed:\n{cpp}")
+    with tempfile.TemporaryDirectory() as workdir:
+        cpp_path = os.path.join(workdir, "program.cpp")
+        exe_path = os.path.join(workdir, "program")
+        with open(cpp_path, "w") as f:
+            f.write(cpp)
+        build = subprocess.run([CXX, "-std=c++17", "-O2", "-pthread", cpp_path, "-o", exe_path],
+                               capture_output=True, text=True)
+        if build.returncode != 0:
+            raise AssertionError(f"g++ failed:\n{build.stderr}")
+        return subprocess.run([exe_path], input=stdin, capture_output=True, text=True, timeout=60,
+                              env=dict(os.environ, **(env or {})))
+
+def output(source, flags=(), stdin="", env=None):
+    # Lines printed by a program that must exit successfully
+    result = run(source, flags, stdin, env)
+    if result.returncode != 0:
+        raise AssertionError(f"program exited with {result.returncode}:\n{result.stderr}")
+    return result.stdout.splitlines()
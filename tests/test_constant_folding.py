@@ -0,0 +1,94 @@
+import unittest
+
+from support import HAS_CXX, CXX, output, transpile
+
+# Constant calls are folded by the compiler; the same calls with a variable
+# argument are left for g++. Both must print the same values.
+
+PROGRAM = """
+def mix(x: int) -> float {
+    let float y = x * 0.1;
+    return y;
+}
+
+def above(x: int) -> int {
+    if (x > 16777216.0) {
+        return 1;
+    }
+    return 0;
+}
+
+def third(x: int) -> float {
+    return x / 3.0;
+}
+
+def scaled(x: int) -> float {
+    return 0.5 + x;
+}
+
+let int n = 16777217;
+print(mix(16777217));
+print(mix(n));
+print(above(16777217));
+print(above(n));
+print(third(16777217));
+print(third(n));
+print(scaled(16777217));
+print(scaled(n));
+print(mix(16777217) == mix(n));
+print(above(16777217) == above(n));
+print(third(16777217) == third(n));
+print(scaled(16777217) == scaled(n));
+"""
+
+SHADOWING = """
+def f(n: int) -> int {
+    let int x = 1;
+    if (n > 0) {
+        let int x = 5;
+        x = x + n;
+    }
+    return x;
+}
+
+def g(n: int) -> float {
+    let float y = 1.5;
+    let int i = 0;
+    while (i < n) {
+        let int y = 7;
+        i = i + y;
+    }
+    return y;
+}
+
+let int k = 3;
+print(f(3));
+print(f(k));
+print(g(2));
+print(g(k - 1));
+"""
+
+class ConstantFoldingTest(unittest.TestCase):
+    def test_constant_calls_are_folded(self):
+        cpp = transpile(PROGRAM)[1]
+        self.assertIn("_print_simple(mix ( n ));", cpp)
+        self.assertNotIn("_print_simple(mix ( 16777217 ));", cpp)
+
+    @unittest.skipUnless(HAS_CXX, f"{CXX} not found")
+    def test_folded_matches_unfolded(self):
+        lines = output(PROGRAM)
+        folded, unfolded, same = lines[0:8:2], lines[1:8:2], lines[8:]
+        self.assertEqual(folded, unfolded)
+        self.assertEqual(same, ["1"] * 4)
+
+    def test_shadowing_calls_are_folded(self):
+        cpp = transpile(SHADOWING)[1]
+        self.assertNotIn("_print_simple(f ( 3 ));", cpp)
+        self.assertNotIn("_print_simple(g ( 2 ));", cpp)
+
+    @unittest.skipUnless(HAS_CXX, f"{CXX} not found")
+    def test_shadowed_locals_keep_their_scope(self):
+        self.assertEqual(output(SHADOWING), ["1", "1", "1.5", "1.5"])
+
+if __name__ == "__main__":
+    unittest.main()
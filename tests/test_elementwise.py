@@ -0,0 +1,107 @@
+import unittest
+
+from support import HAS_CXX, CXX, output, run
+
+# Whole-array arithmetic, sum() and dot()
+
+@unittest.skipUnless(HAS_CXX, f"{CXX} not found")
+class ElementwiseTest(unittest.TestCase):
+    def test_target_read_at_constant_index(self):
+        lines = output("""
+let int[] a = [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 2];
+a = a + a[0];
+print(a[11]);
+""")
+        self.assertEqual(lines, ["3"])
+
+    def test_sum_of_target_is_computed_once(self):
+        lines = output("""
+let int[] b = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12];
+b = b - sum(b);
+print(b[11]);
+""")
+        self.assertEqual(lines, ["-66"])
+
+    def test_scalar_call_runs_once(self):
+        lines = output("""
+def k() -> int {
+    print("called");
+    return 2;
+}
+let int[] a = [1, 2, 3];
+let int[] d = a * k();
+print(d[2]);
+print(sum(a * k()));
+""")
+        self.assertEqual(lines, ["called", "6", "called", "12"])
+
+    def test_target_passed_to_call(self):
+        lines = output("""
+def total(xs: int[]) -> int {
+    return sum(xs);
+}
+let int[] c = [1, 2, 3];
+c = c * total(c) + c[2];
+print(c[0]);
+print(c[2]);
+""")
+        self.assertEqual(lines, ["9", "21"])
+
+    def test_results(self):
+        lines = output("""
+let float[] a = [1.0, 2.0, 3.0];
+let float[] b = [4.0, 5.0, 6.0];
+let float[] c = a * 2.0 + b;
+print(c[0]);
+print(c[2]);
+c = c - a / 2.0;
+print(c[1]);
+print(sum(c));
+print(dot(a, b));
+print(sum(a * b + c));
+let int[] xs = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11];
+let int[] ys = xs * 3 - 1;
+print(ys[10]);
+print(sum(ys));
+print(sum(xs / 2));
+print("sum: " + string(sum(xs)));
+""")
+        self.assertEqual(lines, ["6", "12", "8", "24", "32", "56", "32", "187", "30", "sum: 66"])
+
+    def test_arithmetic_inside_call_arguments(self):
+        lines = output("""
+def total(xs: int[]) -> int {
+    return sum(xs);
+}
+let int[] a = [1, 2, 3];
+let int[] b = [10, 20, 30];
+print(total(a + b));
+print(total((a + b) * 2));
+print(a[0] * total(a * b));
+let int[] d = a * total(a);
+print(d[2]);
+""")
+        self.assertEqual(lines, ["66", "132", "140", "18"])
+
+    def test_length_mismatch(self):
+        result = run("""
+let int[] xs = [1, 2, 3];
+let int[] few = [1, 2];
+let int[] bad = xs + few;
+print(bad[0]);
+""")
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(result.stdout, "")
+        self.assertIn("Array length mismatch in 'xs + few'", result.stderr)
+
+    def test_dot_length_mismatch(self):
+        result = run("""
+let float[] a = [1.0, 2.0];
+let float[] b = [1.0];
+print(dot(a, b));
+""")
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("Array length mismatch", result.stderr)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+
+from support import HAS_CXX, CXX, output, run
+
+# map<K, V> and the _NovaMap runtime
+
+@unittest.skipUnless(HAS_CXX, f"{CXX} not found")
+class MapTest(unittest.TestCase):
+    def test_copy_between_entries_across_grow(self):
+        # 12 entries fill the first table; inserting key 100 grows it
+        lines = output("""
+let map<int, string> m = {};
+let int i = 0;
+while (i < 12) {
+    m[i] = "v" + string(i);
+    i = i + 1;
+}
+m[100] = m[0];
+print(m[100]);
+print(m.size());
+""")
+        self.assertEqual(lines, ["v0", "13"])
+
+    def test_insert_lookup_remove_across_grows(self):
+        lines = output("""
+let map<int, int> m = {};
+let int i = 0;
+while (i < 1000) {
+    m[i * 7] = i;
+    i = i + 1;
+}
+print(m.size());
+print(m[6993]);
+i = 0;
+while (i < 1000) {
+    if (i % 2 == 0) {
+        m.remove(i * 7);
+    }
+    i = i + 1;
+}
+print(m.size());
+print(m.contains(14));
+print(m.contains(7));
+let int ok = 1;
+i = 1;
+while (i < 1000) {
+    if (m[i * 7] != i) {
+        ok = 0;
+    }
+    i = i + 2;
+}
+print(ok);
+let int total = 0;
+for (k, v in m) {
+    total = total + v;
+}
+print(total);
+""")
+        self.assertEqual(lines, ["1000", "999", "500", "0", "1", "1", "250000"])
+
+    def test_string_keys_and_union_values(self):
+        lines = output("""
+let map<string, int> ages = {"ann": 31, "bob": 42};
+ages["cy"] = 7;
+ages["bob"] = ages["bob"] + 1;
+print(ages["bob"]);
+print(ages.size());
+ages.remove("ann");
+print(ages.contains("ann"));
+let int total = 0;
+for (name in ages) {
+    total = total + ages[name];
+}
+print(total);
+let map<string, int or string> mixed = {"a": 1};
+mixed["b"] = "bee";
+print(mixed["b"]);
+let map<float, int> fm = {};
+fm[0.5] = 3;
+fm[0.0 - 0.0] = 4;
+print(fm[0.5] + fm[0.0]);
+""")
+        self.assertEqual(lines, ["43", "3", "0", "50", "bee", "7"])
+
+    def test_missing_key(self):
+        result = run("""
+let map<string, int> m = {"a": 1};
+print(m["zzz"]);
+""")
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("Key not found in map: zzz", result.stderr)
+
+    def test_for_over_range_and_array(self):
+        lines = output("""
+let int total = 0;
+for (i in 2..5) {
+    total = total + i;
+}
+print(total);
+let string[] words = ["one", "two"];
+for (w in words) {
+    print(w);
+}
+""")
+        self.assertEqual(lines, ["9", "one", "two"])
+
+if __name__ == "__main__":
+    unittest.main()
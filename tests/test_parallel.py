@@ -0,0 +1,133 @@
+import unittest
+
+from support import HAS_CXX, CXX, output, run, transpile
+
+# parallel for: results, reductions and the data race checks
+
+THREADS = {"NOVA_NUM_THREADS": "4"}
+
+@unittest.skipUnless(HAS_CXX, f"{CXX} not found")
+class ParallelForTest(unittest.TestCase):
+    def test_range_and_reductions(self):
+        lines = output("""
+def sq(x: int) -> float {
+    return float(x) * 2.0;
+}
+let int n = 100000;
+let float[] out = [];
+out.resize(n);
+parallel for (i in 0..n) {
+    out[i] = sq(i);
+}
+let float best = 0.0;
+let float low = 1000000.0;
+let int cnt = 0;
+let int evens = 0;
+parallel for (s in out) reduce(max: best, min: low, sum: cnt, sum: evens) {
+    cnt = cnt + 1;
+    if (s > best) {
+        best = s;
+    }
+    if (s < low) {
+        low = s;
+    }
+    let int k = int(s);
+    if (k % 4 == 0) {
+        evens = evens + 1;
+    }
+}
+print(best);
+print(low);
+print(cnt);
+print(evens);
+""", env=THREADS)
+        self.assertEqual(lines, ["199998", "0", "100000", "50000"])
+
+    def test_iterable_is_evaluated_once(self):
+        lines = output("""
+def make(n: int) -> int[] {
+    print("made");
+    let int[] r = [];
+    let int i = 0;
+    while (i < n) {
+        r.push_back(i);
+        i = i + 1;
+    }
+    return r;
+}
+let int s = 0;
+parallel for (x in make(1000)) reduce(sum: s) {
+    s = s + x;
+}
+print(s);
+""", env=THREADS)
+        self.assertEqual(lines, ["made", "499500"])
+
+    def test_runtime_error_on_worker_exits_cleanly(self):
+        program = """
+let map<int, int> m = {0: 1, 1: 2};
+let int n = 100000;
+let int[] out = [];
+out.resize(n);
+parallel for (i in 0..n) {
+    out[i] = m[i];
+}
+print(out[0]);
+"""
+        for _ in range(3):
+            result = run(program, env=THREADS)
+            self.assertEqual(result.returncode, 1)
+            self.assertIn("Key not found in map", result.stderr)
+
+class RaceCheckTest(unittest.TestCase):
+    def assertRejected(self, body, message, setup="let int[] xs = [0, 0];\nlet int x = 0;\n"):
+        returncode, error = transpile(setup + "parallel for (i in 0..10) {\n" + body + "\n}\n")
+        self.assertNotEqual(returncode, 0)
+        self.assertIn(message, error)
+
+    def test_outer_assignment(self):
+        self.assertRejected("x = x + i;", "assignment to outer variable 'x'")
+
+    def test_shadowed_in_nested_block(self):
+        self.assertRejected("if (i > 2) {\n let int x = 1;\n}\nx = i;", "assignment to outer variable 'x'")
+
+    def test_assignment_before_declaration(self):
+        self.assertRejected("x = i;\nlet int x = 2;", "assignment to outer variable 'x'")
+
+    def test_constant_index(self):
+        self.assertRejected("xs[0] = xs[0] + 1;", "every iteration writes 'xs[0]'")
+
+    def test_mutating_method(self):
+        self.assertRejected("xs.push_back(i);", "'xs.push_back(...)' modifies an outer container")
+
+    def test_outer_map(self):
+        self.assertRejected("m[i] = i;", "assignment to outer map 'm'", setup="let map<int, int> m = {};\n")
+
+    def test_loop_variable(self):
+        self.assertRejected("i = 0;", "Cannot assign to loop variable 'i'")
+
+    def test_return(self):
+        self.assertRejected("return;", "'return' is not allowed inside parallel for")
+
+    def test_non_numeric_reduction(self):
+        returncode, error = transpile('let string s = "";\nparallel for (i in 0..10) reduce(sum: s) {\n}\n')
+        self.assertNotEqual(returncode, 0)
+        self.assertIn("Reduction variable 's' must be an int or float", error)
+
+    def test_loop_local_writes_are_accepted(self):
+        returncode, error = transpile("""
+let int[] out = [0, 0, 0, 0, 0, 0, 0, 0];
+parallel for (i in 0..4) {
+    let int j = i * 2;
+    out[j] = i;
+    out[j + 1] = i;
+    if (i > 1) {
+        let int y = i;
+        y = y + 1;
+    }
+}
+""")
+        self.assertEqual(returncode, 0, error)
+
+if __name__ == "__main__":
+    unittest.main()
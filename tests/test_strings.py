@@ -0,0 +1,55 @@
+import unittest
+
+from support import HAS_CXX, CXX, output, transpile
+
+# String concatenation: _str_cat/_str_append must print exactly what plain
+# std::string concatenation (--no-string-builder) prints.
+
+PROGRAM = """
+let string s = "start";
+let int i = 0;
+while (i < 5) {
+    s = s + "," + string(i * 7 - 3);
+    i = i + 1;
+}
+print(s);
+let float f = 0.1;
+print("f=" + string(f) + " neg=" + string(0.0 - 2.5) + " big=" + string(123456.789));
+print("tiny=" + string(0.0000004) + " huge=" + string(300000000000000000000.0));
+print(string(2147483647) + "/" + string(0 - 2147483647 - 1));
+let string t = "";
+t = t + "a" + "b";
+t = t + t;
+print(t);
+let string[] words = ["x", "y", "z"];
+let string joined = "";
+for (w in words) {
+    joined = joined + w + "-";
+}
+print(joined);
+print("len " + string(joined.size()));
+"""
+
+@unittest.skipUnless(HAS_CXX, f"{CXX} not found")
+class StringBuilderTest(unittest.TestCase):
+    def test_builder_matches_plain_concatenation(self):
+        self.assertEqual(output(PROGRAM), output(PROGRAM, ["--no-string-builder"]))
+
+    def test_numbers_in_chains_are_formatted(self):
+        lines = output("""
+let int i = 3;
+let string s = "v";
+print("n=" + i * 2);
+print(s + i + 1.5);
+print(1 + 2 + s);
+""")
+        self.assertEqual(lines, ["n=6", "v31.500000", "3v"])
+
+class StringLoweringTest(unittest.TestCase):
+    def test_chain_and_append_are_lowered(self):
+        cpp = transpile('let string s = "a";\ns = s + "b" + string(1);\nprint("x" + s);\n')[1]
+        self.assertIn('_str_append(s, "b", 1);', cpp)
+        self.assertIn('_str_cat("x", s)', cpp)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+
+from support import HAS_CXX, CXX, output, transpile
+
+# Struct field reordering and @soa struct arrays
+
+MIXED = """
+struct Rec {
+    a: int;
+    s: string;
+    b: float;
+    c: int;
+}
+"""
+
+class StructTest(unittest.TestCase):
+    def test_fields_are_reordered(self):
+        cpp = transpile(MIXED)[1]
+        self.assertLess(cpp.index("std::string s;"), cpp.index("int a;"))
+        self.assertIn("Rec(int a, std::string s, float b, int c)", cpp)
+
+    @unittest.skipUnless(HAS_CXX, f"{CXX} not found")
+    def test_new_takes_declared_order_after_reordering(self):
+        lines = output(MIXED + """
+let Rec r = new Rec(1, "two", 3.5, 4);
+print(r.a);
+print(r.s);
+print(r.b);
+print(r.c);
+let Rec[] rs = [r, new Rec(5, "six", 7.5, 8)];
+rs[1].c = rs[1].c + r.c;
+print(rs[1].s);
+print(rs[1].c);
+""")
+        self.assertEqual(lines, ["1", "two", "3.5", "4", "six", "12"])
+
+    @unittest.skipUnless(HAS_CXX, f"{CXX} not found")
+    def test_soa_indexing(self):
+        lines = output("@soa" + MIXED + """
+let Rec[] rs = [new Rec(1, "one", 1.5, 10), new Rec(2, "two", 2.5, 20)];
+rs.push_back(new Rec(3, "three", 3.5, 30));
+rs[0].b = rs[0].b + 10.0;
+rs[1] = new Rec(7, "seven", 7.5, 70);
+let Rec r = rs[1];
+print(rs.size());
+print(rs[0].b);
+print(r.s);
+print(rs[2].c);
+let int i = 0;
+let int total = 0;
+while (i < rs.size()) {
+    total = total + rs[i].a;
+    i = i + 1;
+}
+print(total);
+""")
+        self.assertEqual(lines, ["3", "11.5", "seven", "30", "11"])
+
+    @unittest.skipUnless(HAS_CXX, f"{CXX} not found")
+    def test_soa_for_loop(self):
+        lines = output("""
+@soa struct Q {
+    id: int;
+    w: float;
+}
+def make() -> Q[] {
+    let Q[] r = [new Q(1, 1.5), new Q(2, 2.5)];
+    return r;
+}
+let Q[] qs = [new Q(1, 1.0), new Q(2, 2.0), new Q(3, 3.0)];
+for (q in qs) {
+    q.w = q.w * 2.0;
+}
+let float t = 0.0;
+for (q in qs) {
+    for (p in qs) {
+        t = t + q.w * p.w;
+    }
+}
+print(t);
+for (q in make()) {
+    print(q.id);
+}
+""")
+        self.assertEqual(lines, ["144", "1", "2"])
+
+    def test_soa_array_type(self):
+        cpp = transpile("@soa" + MIXED + "let Rec[] rs = [];\n")[1]
+        self.assertIn("Rec_soa rs", cpp)
+
+if __name__ == "__main__":
+    unittest.main()